@@ -0,0 +1,36 @@
+"""
+A csomag fő osztályai a lighttest_basic-ből is importálhatók. A modulok csak az első használatkor töltődnek be,
+így a csak API-teszteket futtató folyamatok nem importálják a seleniumot, az sqlalchemy-t és a többi nehéz függőséget.
+"""
+import importlib
+
+_LAZY_ATTRIBUTES: dict[str, str] = {
+    "MiUsIn": "interface_methods",
+    "DriverManagement": "interface_methods",
+    "BrowserPool": "browser_pool",
+    "StepPerformanceCapture": "frontend_performance",
+    "ScreenshotWriter": "screenshot_writer",
+    "Calls": "http_requests",
+    "HttpHeaders": "http_headers",
+    "SqlConnection": "sql_methods",
+    "Mongo": "mongo_connection",
+    "BulkWriter": "mongo_bulk_writer",
+    "IndexRegistry": "mongo_indexes",
+    "SlowQueryCheck": "mongo_indexes",
+    "QueryCache": "mongo_cache",
+    "PerformanceStore": "performance_store",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(importlib.import_module(f"{__name__}.{_LAZY_ATTRIBUTES[name]}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,229 @@
+"""
+Előre elindított, újrahasznosított böngészőpéldányok a tesztesetek párhuzamos futtatásához
+"""
+import queue
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable
+from urllib.parse import urlsplit
+
+from selenium.common import WebDriverException
+from selenium.webdriver import Chrome
+
+from lighttest_basic.interface_methods import DriverManagement, MiUsIn
+
+_CLEAR_STORAGE_SCRIPT: str = """
+try { window.localStorage.clear(); } catch (error) {}
+try { window.sessionStorage.clear(); } catch (error) {}
+"""
+
+
+def create_headless_chrome() -> Chrome:
+    return DriverManagement.create_driver(headless=True)
+
+
+class PooledSession:
+    """
+    A browser session of the pool: the MiUsIn object and the number of testcases it has run.
+    """
+
+    def __init__(self, miusin: MiUsIn):
+        self.miusin: MiUsIn = miusin
+        self.uses: int = 0
+
+    def is_healthy(self) -> bool:
+        try:
+            self.miusin.driver.current_window_handle
+        except WebDriverException:
+            return False
+        return True
+
+    def reset(self) -> None:
+        """
+        Remove the state of the previous testcase instead of relaunching the browser:
+        close the extra windows, clear the storages and the cookies of every origin,
+        remove the blocked urls and the response stubs, and open an empty page.
+        """
+        driver: Chrome = self.miusin.driver
+        window_handles: list[str] = driver.window_handles
+        visited_origins: set[str] = set()
+        for window_handle in reversed(window_handles):
+            driver.switch_to.window(window_handle)
+            visited_origins.add(_origin(driver.current_url))
+            if window_handle != window_handles[0]:
+                driver.close()
+        driver.switch_to.window(window_handles[0])
+        try:
+            self._clear_browser_data(visited_origins)
+        except (AttributeError, WebDriverException):
+            driver.execute_script(_CLEAR_STORAGE_SCRIPT)
+            driver.delete_all_cookies()
+        for clear_interception in (self.miusin.unblock_requests, self.miusin.clear_response_stubs):
+            try:
+                clear_interception()
+            except (AttributeError, WebDriverException):
+                pass
+        driver.get("about:blank")
+        self.miusin.reset_case_state()
+
+    def _clear_browser_data(self, visited_origins: set[str]) -> None:
+        """
+        Clear the cookies of the whole browser and the storages of the visited and the cookie-setting origins
+        with CDP, so the state of other origins (for example an SSO domain) isn't carried into the next lease.
+        """
+        driver: Chrome = self.miusin.driver
+        cookies: list[dict] = driver.execute_cdp_cmd("Storage.getCookies", {}).get("cookies", [])
+        for cookie in cookies:
+            domain: str = cookie["domain"].lstrip(".")
+            visited_origins.update({f"https://{domain}", f"http://{domain}"})
+        driver.execute_cdp_cmd("Storage.clearCookies", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        for origin in visited_origins - {""}:
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+
+    def quit(self) -> None:
+        try:
+            self.miusin.driver.quit()
+        except WebDriverException:
+            pass
+
+
+class BrowserPool:
+    """
+    Pre-launch N browsers and lease one MiUsIn object per testcase.
+    Between the leases the browser state is reset instead of relaunching the browser,
+    broken sessions and sessions used max_uses times are replaced with new ones.
+    Drivers can't be shared between processes, so the cases run on a thread pool.
+    For process level parallelism every process has to create its own pool.
+
+    Example:
+        with BrowserPool(size=4) as pool:
+            results = pool.run_cases([login_case, search_case, logout_case])
+    """
+
+    def __init__(self, size: int = 4, driver_factory: Callable[[], Chrome] = create_headless_chrome,
+                 max_uses: int = 50, implicit_wait: float = 5):
+        """
+        Arguments:
+            size: the number of browsers.
+            driver_factory: a function that creates a new driver. Default: headless chrome.
+            max_uses: the session is recycled after this number of testcases.
+            implicit_wait: the implicit wait of the drivers.
+        """
+        self.size: int = size
+        self.driver_factory: Callable[[], Chrome] = driver_factory
+        self.max_uses: int = max_uses
+        self.implicit_wait: float = implicit_wait
+        self.recycled_sessions: int = 0
+        self._idle_sessions: queue.Queue = queue.Queue()
+        self._sessions: list[PooledSession] = []
+        self._lock = threading.Lock()
+        try:
+            with ThreadPoolExecutor(max_workers=size) as executor:
+                for session in executor.map(lambda _: self._create_session(), range(size)):
+                    self._idle_sessions.put(session)
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @contextmanager
+    def lease(self, timeout: float = None):
+        """
+        Lease a MiUsIn object for a testcase. It blocks until a session is free.
+
+        Example:
+            with pool.lease() as miusin:
+                miusin.jump_webpage("https://example.com")
+        """
+        session: PooledSession | None = self._idle_sessions.get(timeout=timeout)
+        if session is None or not session.is_healthy():
+            session = self._replace(session)
+        session.uses += 1
+        try:
+            yield session.miusin
+        finally:
+            self._release(session)
+
+    def run_cases(self, cases: Iterable[Callable[[MiUsIn], object]]) -> list:
+        """
+        Run the testcases in parallel, every case gets a leased MiUsIn object as its only argument.
+
+        Return:
+            the return values of the cases in the order of the cases.
+        """
+
+        def run_case(case: Callable[[MiUsIn], object]):
+            with self.lease() as miusin:
+                return case(miusin)
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(run_case, cases))
+
+    def close(self) -> None:
+        with self._lock:
+            sessions: list[PooledSession] = self._sessions
+            self._sessions = []
+        for session in sessions:
+            session.quit()
+
+    def _create_session(self) -> PooledSession:
+        miusin = MiUsIn(driver=self.driver_factory(), fullsize_windows=False)
+        miusin.set_implicitly_wait(self.implicit_wait)
+        session = PooledSession(miusin)
+        with self._lock:
+            self._sessions.append(session)
+        return session
+
+    def _recycle(self, session: PooledSession | None) -> PooledSession:
+        if session is not None:
+            session.quit()
+            with self._lock:
+                if session in self._sessions:
+                    self._sessions.remove(session)
+                self.recycled_sessions += 1
+        return self._create_session()
+
+    def _replace(self, session: PooledSession | None) -> PooledSession:
+        """
+        Replace a broken session or an empty slot. If the driver factory fails, the empty slot (None)
+        is put back into the pool, so a later lease retries the creation instead of the pool shrinking.
+        """
+        try:
+            return self._recycle(session)
+        except Exception:
+            self._idle_sessions.put(None)
+            raise
+
+    def _release(self, session: PooledSession) -> None:
+        try:
+            if session.uses >= self.max_uses:
+                session = self._recycle(session)
+            else:
+                try:
+                    session.reset()
+                except WebDriverException:
+                    session = self._recycle(session)
+        except Exception as error:
+            session.quit()
+            with self._lock:
+                if session in self._sessions:
+                    self._sessions.remove(session)
+            warnings.warn(f"The browser session couldn't be replaced, the next lease retries it: {error}",
+                          stacklevel=2)
+            session = None
+        self._idle_sessions.put(session)
+
+
+def _origin(url: str) -> str:
+    split_url = urlsplit(url)
+    if split_url.scheme not in ("http", "https"):
+        return ""
+    return f"{split_url.scheme}://{split_url.netloc}"
@@ -1,23 +1,48 @@
 import json
 from dataclasses import dataclass, field
 from enum import unique, Enum
+from typing import TYPE_CHECKING
 
-from sqlalchemy.engine import CursorResult
+if TYPE_CHECKING:
+    from sqlalchemy.engine import CursorResult
 
 
-@dataclass(kw_only=True)
-class Calls:
+class Record:
+    """
+    Base class of the result records. The serialisers don't deep copy the values like dataclasses.asdict.
+    """
+    __slots__ = ()
+
+    def to_dict(self) -> dict:
+        return {name: _to_plain_value(getattr(self, name)) for name in self.__slots__}
+
+    def to_bson(self) -> bytes:
+        import bson
+
+        return bson.encode(self.to_dict())
+
+
+def _to_plain_value(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+@dataclass(kw_only=True, slots=True)
+class Calls(Record):
     response: object = None
     response_time: float = 0.0
     request: object = None
-    response_json: dict = field(default_factory={})
+    response_json: dict = field(default_factory=dict)
     status_code: int = 0
-    headers: dict = field(default_factory={})
+    headers: dict = field(default_factory=dict)
     url: str = ""
 
 
-@dataclass(kw_only=True)
-class TestResult:
+@dataclass(kw_only=True, slots=True)
+class TestResult(Record):
     fast: bool
     successful: bool
 
@@ -30,6 +55,12 @@ class ResultTypes(Enum):
     UNRECOGNISABLE = "UNRECOGNISABLE"
 
 
+@unique
+class SamplingMethods(Enum):
+    FIRST: str = "first"
+    RESERVOIR: str = "reservoir"
+
+
 @unique
 class TestTypes(Enum):
     FRONTEND = "frontend"
@@ -37,30 +68,31 @@ class TestTypes(Enum):
     DATABASE = "database"
 
 
-@dataclass(kw_only=True)
-class BackendPerformanceStatisticPost:
+@dataclass(kw_only=True, slots=True)
+class BackendPerformanceStatisticPost(Record):
     result: str
     request_url: str
     response_time: float
 
 
-@dataclass(kw_only=True)
-class PerformancePost:
+@dataclass(kw_only=True, slots=True)
+class PerformancePost(Record):
     name: str
     required_time: float
 
 
-@dataclass(kw_only=True)
-class UniversalPerformancePost:
+@dataclass(kw_only=True, slots=True)
+class UniversalPerformancePost(Record):
     test_type: str
     testcase_name: str
     required_time: float
     result: str
     description: str
+    metrics: dict = None
 
 
-@dataclass(kw_only=True)
-class BackendError:
+@dataclass(kw_only=True, slots=True)
+class BackendError(Record):
     positivity: str
     req_payload: dict
     req_response: dict
@@ -71,17 +103,17 @@ class BackendError:
     request_url: str
 
 
-@dataclass(kw_only=True)
-class QueryResult:
+@dataclass(kw_only=True, slots=True)
+class QueryResult(Record):
     required_time: float
-    result: CursorResult
+    result: "CursorResult"
     query: str
     alias: str
     error_message: str = ""
 
 
-@dataclass(kw_only=True)
-class QueryErrorPost:
+@dataclass(kw_only=True, slots=True)
+class QueryErrorPost(Record):
     alias: str
     expected_query_timelimit: float
     required_time: float
@@ -94,8 +126,8 @@ class QueryErrorPost:
     actual_result: list
 
 
-@dataclass(kw_only=True)
-class CaseStep:
+@dataclass(kw_only=True, slots=True)
+class CaseStep(Record):
     """
     contains every necessary information about the case's step.
     """
@@ -111,18 +143,50 @@ class CaseStep:
     data: str = ""
 
 
-@dataclass()
-class BackendResultDatas:
+@dataclass(slots=True)
+class BackendResultDatas(Record):
     url: str = ""
     response_time: int = 0
     headers: json = None
     request: json = None
     status_code: int = None
     response_json: json = None
+    response_headers: dict = None
+
+
+@dataclass(kw_only=True, slots=True)
+class ResultSample(Record):
+    """
+    A bounded representation of a query result for the error-logpost.
+    """
+    rows: list
+    row_count: int
+    content_hash: str
+    sampling_method: str
 
 
-@dataclass(kw_only=True)
-class QueryAssertionResult:
+@dataclass(kw_only=True, slots=True)
+class QueryAssertionResult(Record):
     errors: set
     not_found_rows: list[dict]
     query_result: set
+    result_sample: ResultSample = None
+    fingerprint: str = ""
+    fingerprint_match: bool = False
+
+
+@dataclass(kw_only=True, slots=True)
+class SlowQueryReport(Record):
+    collection: str
+    query: dict
+    required_time: float
+    plan_stages: list[str]
+    collection_scan: bool
+
+
+@dataclass(kw_only=True, slots=True)
+class DriverStartupMetrics(Record):
+    chromedriver_path: str
+    headless: bool
+    driver_resolution_time: float
+    browser_launch_time: float
@@ -0,0 +1,162 @@
+"""
+A felületi tesztlépések performanciájának mérése a Chrome DevTools Protocol és a Navigation Timing segítségével
+"""
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable
+
+from selenium.common import WebDriverException
+
+from lighttest_basic.datacollections import ResultTypes, TestTypes, UniversalPerformancePost
+
+_COUNTER_METRICS: tuple[str, ...] = ("LayoutCount", "RecalcStyleCount", "LayoutDuration", "RecalcStyleDuration",
+                                     "ScriptDuration", "TaskDuration")
+_GAUGE_METRICS: tuple[str, ...] = ("JSHeapUsedSize", "Nodes", "JSEventListeners")
+
+_PAGE_TIMING_SCRIPT: str = """
+const [resourceOffset, startTimeOrigin, lcpWaitMs] = arguments;
+const callback = arguments[arguments.length - 1];
+const navigation = performance.getEntriesByType("navigation")[0];
+const resources = performance.getEntriesByType("resource");
+const newResources = resources.slice(performance.timeOrigin === startTimeOrigin ? resourceOffset : 0);
+const timings = {
+    url: location.href,
+    request_count: newResources.length,
+    transferred_bytes: newResources.reduce((total, entry) => total + (entry.transferSize || 0), 0),
+    ttfb: navigation ? navigation.responseStart - navigation.startTime : null,
+    dom_content_loaded: navigation ? navigation.domContentLoadedEventEnd - navigation.startTime : null,
+    load: navigation ? navigation.loadEventEnd - navigation.startTime : null,
+    largest_contentful_paint: null,
+};
+let finished = false;
+const finish = () => {
+    if (finished) { return; }
+    finished = true;
+    callback(timings);
+};
+try {
+    new PerformanceObserver((entries) => {
+        const lastEntry = entries.getEntries().pop();
+        if (lastEntry) { timings.largest_contentful_paint = lastEntry.startTime; }
+        finish();
+    }).observe({type: "largest-contentful-paint", buffered: true});
+} catch (error) {
+    finish();
+}
+setTimeout(finish, lcpWaitMs);
+"""
+
+_RESOURCE_POSITION_SCRIPT: str = """
+performance.clearResourceTimings();
+performance.setResourceTimingBufferSize(arguments[0]);
+return [performance.getEntriesByType("resource").length, performance.timeOrigin];
+"""
+
+
+class StepPerformanceCapture:
+    """
+    Measure the ui test steps and create UniversalPerformancePost records with the frontend test type.
+    Every record contains the wall time of the step and in the metrics field:
+        - the Navigation Timing of the current page: ttfb, dom_content_loaded, load (in ms)
+        - the largest_contentful_paint (in ms)
+        - the request_count and the transferred_bytes of the requests started during the step.
+          The transferSize of a cross-origin resource is 0 without a Timing-Allow-Origin header,
+          so these requests are counted but their bytes are not.
+        - the change of the chrome Performance.getMetrics counters during the step, like ScriptDuration
+        - the JSHeapUsedSize, Nodes and JSEventListeners at the end of the step
+    The CDP metrics are skipped on other browsers than chrome.
+
+    Example:
+        capture = StepPerformanceCapture(driver, testcase_name="login", sink=performance_store.append)
+        with capture.step("open the login page", performance_limit_in_seconds=2):
+            miusin.jump_webpage("https://example.com/login")
+    """
+    lcp_wait_in_seconds: float = 0.05
+    resource_timing_buffer_size: int = 10000
+
+    def __init__(self, driver, testcase_name: str = "", sink: Callable[[UniversalPerformancePost], object] = None):
+        """
+        Arguments:
+            driver: the webdriver of the measured steps.
+            testcase_name: the testcase_name of the created records.
+            sink: it gets every created record, for example a PerformanceStore's append or a BulkWriter's write.
+        """
+        self.driver = driver
+        self.testcase_name: str = testcase_name
+        self.sink = sink
+        self.performance_posts: list[UniversalPerformancePost] = []
+        self._cdp_available: bool | None = None
+
+    @contextmanager
+    def step(self, description: str, performance_limit_in_seconds: float = None):
+        """
+        Measure the steps inside the with block. If the block raises an exception, the record's result is failed,
+        if it is slower than the performance_limit_in_seconds, the result is slow.
+        """
+        start_metrics: dict[str, float] = self._get_cdp_metrics()
+        resource_offset, time_origin = self._get_resource_position()
+        result: str = ResultTypes.SUCCESSFUL.value
+        start_time: float = perf_counter()
+        try:
+            yield
+        except Exception:
+            result = ResultTypes.FAILED.value
+            raise
+        finally:
+            required_time: float = perf_counter() - start_time
+            if result == ResultTypes.SUCCESSFUL.value and performance_limit_in_seconds is not None \
+                    and required_time > performance_limit_in_seconds:
+                result = ResultTypes.SLOW.value
+            metrics: dict = self._get_page_timings(resource_offset, time_origin)
+            metrics.update(_metric_changes(start_metrics, self._get_cdp_metrics()))
+            self._record(UniversalPerformancePost(test_type=TestTypes.FRONTEND.value, testcase_name=self.testcase_name,
+                                                  required_time=round(required_time, 3), result=result,
+                                                  description=description, metrics=metrics))
+
+    def _record(self, performance_post: UniversalPerformancePost) -> None:
+        self.performance_posts.append(performance_post)
+        if self.sink is not None:
+            self.sink(performance_post)
+
+    def _get_cdp_metrics(self) -> dict[str, float]:
+        if self._cdp_available is None:
+            try:
+                self.driver.execute_cdp_cmd("Performance.enable", {})
+                self._cdp_available = True
+            except (AttributeError, WebDriverException):
+                self._cdp_available = False
+        if not self._cdp_available:
+            return {}
+        try:
+            response: dict = self.driver.execute_cdp_cmd("Performance.getMetrics", {})
+        except WebDriverException:
+            return {}
+        return {metric["name"]: metric["value"] for metric in response.get("metrics", [])}
+
+    def _get_resource_position(self) -> tuple[int, float]:
+        """
+        Return the number of the resource timing entries and the time origin of the current document.
+        The requests of the step are the entries after this position, or every entry if the page navigated away.
+        The resource timing buffer is cleared and enlarged first, because the browser stops recording
+        at 250 entries by default, and the later steps of a busy page would see no requests.
+        """
+        try:
+            resource_count, time_origin = self.driver.execute_script(_RESOURCE_POSITION_SCRIPT,
+                                                                     self.resource_timing_buffer_size)
+            return resource_count, time_origin
+        except (TypeError, ValueError, WebDriverException):
+            return 0, None
+
+    def _get_page_timings(self, resource_offset: int, time_origin: float) -> dict:
+        try:
+            return self.driver.execute_async_script(_PAGE_TIMING_SCRIPT, resource_offset, time_origin,
+                                                    int(self.lcp_wait_in_seconds * 1000)) or {}
+        except WebDriverException:
+            return {}
+
+
+def _metric_changes(start_metrics: dict[str, float], end_metrics: dict[str, float]) -> dict[str, float]:
+    metric_changes: dict[str, float] = {name: end_metrics[name] - start_metrics.get(name, 0)
+                                        for name in _COUNTER_METRICS if name in end_metrics}
+    metric_changes.update({name: end_metrics[name] for name in _GAUGE_METRICS if name in end_metrics})
+    return metric_changes
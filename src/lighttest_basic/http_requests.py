@@ -13,7 +13,6 @@ from time import perf_counter
 from lighttest_supplies.encoding import binary_json_to_json
 from lighttest_supplies.general_datas import TestType as tt
 import json
-import aiohttp
 from lighttest_basic.datacollections import BackendResultDatas
 
 
@@ -42,6 +41,8 @@ def collect_call_request_data(request_function):
 
 
 async def collect_async_data(resp: object, request: dict):
+    import aiohttp
+
     result: BackendResultDatas = copy.deepcopy(BackendResultDatas())
     result.response_headers = resp.headers
     result.status_code = resp.status
@@ -1,45 +1,113 @@
+import base64
 import inspect
+import json
+import mimetypes
+import os
+import re
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass
 from enum import Enum, unique
-from functools import wraps
+from functools import lru_cache, wraps
 from pathlib import Path
+from time import perf_counter
+from typing import Callable
 
 from lighttest_supplies import date_methods
 from lighttest_supplies.timers import Utimer
 
 from selenium import webdriver
-from selenium.webdriver import Keys
+from selenium.webdriver import ChromeOptions, Keys
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions
 from selenium.webdriver.support.wait import WebDriverWait
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.common import exceptions, WebDriverException, TimeoutException
-from lighttest_supplies.general import create_logging_structure, create_logging_directory
-from faker import Faker
-from lighttest_basic.datacollections import CaseStep
+from lighttest_basic.datacollections import CaseStep, DriverStartupMetrics
+from lighttest_basic.frontend_performance import StepPerformanceCapture
+from lighttest_basic.screenshot_writer import ScreenshotWriter, default_screenshot_writer, \
+    default_screenshots_directory
 from lighttest_basic.light_exceptions import NoneAction
 from selenium.webdriver import Chrome
 
-fake = Faker()
+
+class _LazyFaker:
+    """
+    The Faker instance is created at the first use, because its import and creation are slow.
+    """
+    _instance = None
+
+    def __getattr__(self, name: str):
+        if _LazyFaker._instance is None:
+            from faker import Faker
+
+            _LazyFaker._instance = Faker()
+        return getattr(_LazyFaker._instance, name)
+
+
+fake = _LazyFaker()
 
 
 class CaseManagement:
-    def __init__(self, driver: Chrome, screenshots_container_directory: str = "C:\Screenshots"):
+    def __init__(self, driver: Chrome, screenshots_container_directory: str = None):
         self.local_click_xpaths: set[str] = {}
         self.local_field_xpaths: set[str] = {}
         self.teststep_count = 0
         self.testcase_failed: bool = False
         self.error_count: int = 0
-        self.screenshots_container_directory: str = screenshots_container_directory
+        self.screenshots_container_directory: str = default_screenshots_directory() \
+            if screenshots_container_directory is None else screenshots_container_directory
+        self.screenshot_writer: ScreenshotWriter = None
         self.steps_of_reproduction: dict = {}
         self.casebreak = False
         self.combobox_list_xpaths: set[str] = {}
         self.error_in_case = False
         self.driver = driver
         self.action_driver = ActionChains(self.driver)
+        self.element_cache: ElementCache = ElementCache(driver=driver)
+        self.performance_capture: StepPerformanceCapture = StepPerformanceCapture(driver=driver)
+
+    def measure_step(self, description: str, performance_limit_in_seconds: float = None):
+        """
+        Measure the steps inside the with block and create a frontend UniversalPerformancePost record
+        with the page load and CDP metrics. The records are in the performance_capture.performance_posts.
+        The testcase_name and the sink of the records can be set on the performance_capture.
+
+        Example:
+            miusin.performance_capture.sink = performance_store.append
+            with miusin.measure_step("save the form", performance_limit_in_seconds=1.5):
+                miusin.click_by_param("Save")
+        """
+        return self.performance_capture.step(description=description,
+                                             performance_limit_in_seconds=performance_limit_in_seconds)
+
+    def use_element_cache(self, enabled: bool = True) -> None:
+        """
+        Turn on or off the per-page element cache. If it is on, the elements found by xpath are reused
+        by the next steps on the same page. The cache is cleared at navigation and window switch.
+        The hit rate can be checked with element_cache.metrics()
+        """
+        self.element_cache.enabled = enabled
+        self.element_cache.invalidate()
+
+    def reset_case_state(self) -> None:
+        """
+        Reset the testcase level settings and counters, so the same object can run the next testcase.
+        """
+        self.local_click_xpaths = {}
+        self.local_field_xpaths = {}
+        self.combobox_list_xpaths = {}
+        self.teststep_count = 0
+        self.testcase_failed = False
+        self.error_count = 0
+        self.steps_of_reproduction = {}
+        self.casebreak = False
+        self.error_in_case = False
+        self.element_cache.invalidate()
 
     def set_combobox_parent_finding_method_by_xpath(self, *xpaths: str):
         """
@@ -150,6 +218,369 @@ class TestStep:
     step_data: str = ""
 
 
+_PARAM_PATTERN = re.compile(r"'__param__'|\"__param__\"|__param__")
+
+_FIND_PARAMETRIC_ELEMENT_FUNCTION: str = """
+const findFirst = (xpath) => document.evaluate(
+    xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const findParametricElement = (xpaths, preferredIndex, knownElement) => {
+    if (preferredIndex !== null) {
+        const preferredElement = findFirst(xpaths[preferredIndex]);
+        if (preferredElement) { return [preferredElement, preferredIndex]; }
+    }
+    const element = knownElement || findFirst(xpaths.join("|"));
+    if (!element) { return null; }
+    for (let index = 0; index < xpaths.length; index++) {
+        const matches = document.evaluate(xpaths[index], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (let item = 0; item < matches.snapshotLength; item++) {
+            if (matches.snapshotItem(item) === element) { return [element, index]; }
+        }
+    }
+    return [element, null];
+};
+"""
+
+_FIND_PARAMETRIC_ELEMENT_SCRIPT: str = _FIND_PARAMETRIC_ELEMENT_FUNCTION + """
+return findParametricElement(arguments[0], arguments[1], arguments[2]);
+"""
+
+_FILL_FORM_SCRIPT: str = _FIND_PARAMETRIC_ELEMENT_FUNCTION + """
+const keystrokeTypes = ["checkbox", "radio", "file", "button", "submit", "image", "reset"];
+return arguments[0].map(([xpaths, preferredIndex, value]) => {
+    const found = findParametricElement(xpaths, preferredIndex, null);
+    if (!found) { return ["missing", null]; }
+    const [element, matchedIndex] = found;
+    const tagName = element.tagName.toLowerCase();
+    const settable = (tagName === "textarea"
+        || (tagName === "input" && !keystrokeTypes.includes((element.type || "").toLowerCase())));
+    if (!settable || element.disabled || element.readOnly) { return ["needs_keystrokes", matchedIndex]; }
+    const valueDescriptor = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(element), "value");
+    if (!valueDescriptor || !valueDescriptor.set) { return ["needs_keystrokes", matchedIndex]; }
+    const previousValue = element.value;
+    valueDescriptor.set.call(element, value);
+    if (element.value !== value) {
+        valueDescriptor.set.call(element, previousValue);
+        return ["needs_keystrokes", matchedIndex];
+    }
+    element.focus();
+    element.dispatchEvent(new Event("input", {bubbles: true}));
+    element.dispatchEvent(new Event("change", {bubbles: true}));
+    element.blur();
+    return ["filled", matchedIndex];
+});
+"""
+
+_WAIT_FOR_XPATH_SCRIPT: str = """
+const [xpath, condition, untilNot, timeoutMs, fallbackMs] = arguments;
+const callback = arguments[arguments.length - 1];
+const isVisible = (element) => {
+    const style = window.getComputedStyle(element);
+    return style.visibility !== "hidden" && style.display !== "none" && element.getClientRects().length > 0;
+};
+const conditionMet = () => {
+    const element = document.evaluate(
+        xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    let met = element !== null;
+    if (met && (condition === "visible" || condition === "clickable")) { met = isVisible(element); }
+    if (met && condition === "clickable") { met = !element.disabled; }
+    return untilNot ? !met : met;
+};
+if (conditionMet()) { callback(true); return; }
+let finished = false;
+const observer = new MutationObserver(() => { if (conditionMet()) { finish(true); } });
+const fallbackTimer = setInterval(() => { if (conditionMet()) { finish(true); } }, fallbackMs);
+const timeoutTimer = setTimeout(() => finish(false), timeoutMs);
+const finish = (result) => {
+    if (finished) { return; }
+    finished = true;
+    observer.disconnect();
+    clearInterval(fallbackTimer);
+    clearTimeout(timeoutTimer);
+    callback(result);
+};
+observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+"""
+
+_WAIT_FOR_LOAD_SCRIPT: str = """
+const timeoutMs = arguments[0];
+const callback = arguments[arguments.length - 1];
+if (document.readyState === "complete") { callback(true); return; }
+const timeoutTimer = setTimeout(() => callback(false), timeoutMs);
+window.addEventListener("load", () => { clearTimeout(timeoutTimer); callback(true); }, {once: true});
+"""
+
+_NETWORK_TRACKER_SCRIPT: str = """
+(() => {
+    if (window.__lighttestNetwork) { return; }
+    const network = {pending: 0, listeners: new Set()};
+    window.__lighttestNetwork = network;
+    const changed = (delta) => {
+        network.pending = Math.max(network.pending + delta, 0);
+        network.listeners.forEach((listener) => listener());
+    };
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function (...fetchArguments) {
+            changed(1);
+            return originalFetch.apply(this, fetchArguments).finally(() => changed(-1));
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...sendArguments) {
+        changed(1);
+        this.addEventListener("loadend", () => changed(-1), {once: true});
+        return originalSend.apply(this, sendArguments);
+    };
+})();
+"""
+
+_WAIT_FOR_NETWORK_IDLE_SCRIPT: str = """
+const [idleMs, timeoutMs] = arguments;
+const callback = arguments[arguments.length - 1];
+const network = window.__lighttestNetwork;
+if (!network) { callback(null); return; }
+let idleTimer = null;
+const check = () => {
+    clearTimeout(idleTimer);
+    if (network.pending === 0) { idleTimer = setTimeout(() => finish(true), idleMs); }
+};
+const timeoutTimer = setTimeout(() => finish(false), timeoutMs);
+const finish = (result) => {
+    clearTimeout(idleTimer);
+    clearTimeout(timeoutTimer);
+    network.listeners.delete(check);
+    callback(result);
+};
+network.listeners.add(check);
+check();
+"""
+
+_RESPONSE_STUB_SCRIPT: str = """
+(() => {
+    const stubs = __stubs__.map(([pattern, body, contentType, status]) => [
+        new RegExp(pattern), Uint8Array.from(atob(body), (character) => character.charCodeAt(0)), contentType, status]);
+    const findStub = (url) => {
+        const absoluteUrl = new URL(String(url), location.href).href;
+        return stubs.find(([pattern]) => pattern.test(absoluteUrl));
+    };
+    const originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function (input, init) {
+            const stub = findStub(input instanceof Request ? input.url : input);
+            if (!stub) { return originalFetch.apply(this, arguments); }
+            const [, body, contentType, status] = stub;
+            return Promise.resolve(new Response(body, {status: status, headers: {"Content-Type": contentType}}));
+        };
+    }
+    const originalOpen = XMLHttpRequest.prototype.open;
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        this.__lighttestStub = findStub(url);
+        return originalOpen.apply(this, arguments);
+    };
+    XMLHttpRequest.prototype.send = function () {
+        const stub = this.__lighttestStub;
+        if (!stub) { return originalSend.apply(this, arguments); }
+        const [, body, contentType, status] = stub;
+        const text = new TextDecoder().decode(body);
+        const responses = {json: () => JSON.parse(text), arraybuffer: () => body.buffer, blob: () => new Blob([body])};
+        const define = (name, value) => Object.defineProperty(this, name, {configurable: true, value: value});
+        define("readyState", 4);
+        define("status", status);
+        define("statusText", "OK");
+        define("responseText", text);
+        define("response", (responses[this.responseType] || (() => text))());
+        define("getResponseHeader", (name) => name.toLowerCase() === "content-type" ? contentType : null);
+        define("getAllResponseHeaders", () => `content-type: ${contentType}\r\n`);
+        setTimeout(() => ["readystatechange", "load", "loadend"].forEach(
+            (type) => this.dispatchEvent(new ProgressEvent(type))), 0);
+    };
+})();
+"""
+
+_READ_FORM_SCRIPT: str = _FIND_PARAMETRIC_ELEMENT_FUNCTION + """
+return arguments[0].map(([xpaths, preferredIndex]) => {
+    const found = findParametricElement(xpaths, preferredIndex, null);
+    if (!found) { return ["missing", null, null]; }
+    return ["found", found[1], found[0].value];
+});
+"""
+
+
+def xpath_literal(value: str) -> str:
+    """
+    Return the value as an xpath string literal. Values containing both quote types are built with concat().
+    """
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    quoted_parts: list[str] = [f"'{part}'" for part in value.split("'")]
+    apostrophe_separator: str = ", \"'\", "
+    return f"concat({apostrophe_separator.join(quoted_parts)})"
+
+
+class ParametricXpath:
+    """
+    A precompiled parametric xpath. A quoted __param__ is replaced with a correctly escaped string literal.
+    """
+
+    def __init__(self, parametric_xpath: str):
+        self.parametric_xpath: str = parametric_xpath
+        self._parts: list[str] = _PARAM_PATTERN.split(parametric_xpath)
+        self._quoted: list[bool] = [placeholder != InnerStatics.PARAM.value
+                                    for placeholder in _PARAM_PATTERN.findall(parametric_xpath)]
+
+    def render(self, param: str) -> str:
+        rendered_parts: list[str] = [self._parts[0]]
+        for quoted, part in zip(self._quoted, self._parts[1:]):
+            rendered_parts.append(xpath_literal(param) if quoted else param)
+            rendered_parts.append(part)
+        return "".join(rendered_parts)
+
+
+class XpathTemplateSet:
+    """
+    The precompiled alternatives of a parametric xpath set, with the rendered xpaths cached per identifier.
+    It remembers which alternative matched an identifier, so later lookups try that one first.
+    """
+    max_cached_identifiers: int = 4096
+
+    def __init__(self, parametric_xpaths):
+        self.templates: tuple[ParametricXpath, ...] = tuple(
+            ParametricXpath(parametric_xpath) for parametric_xpath in sorted(parametric_xpaths))
+        self._rendered: dict[str, tuple[str, ...]] = {}
+        self._preferred: dict[str, int] = {}
+
+    def alternatives(self, param: str) -> tuple[str, ...]:
+        rendered_xpaths = self._rendered.get(param)
+        if rendered_xpaths is None:
+            if len(self._rendered) >= self.max_cached_identifiers:
+                self._rendered.clear()
+            rendered_xpaths = tuple(template.render(param) for template in self.templates)
+            self._rendered[param] = rendered_xpaths
+        return rendered_xpaths
+
+    def union(self, param: str) -> str:
+        return "|".join(self.alternatives(param))
+
+    def preferred_index(self, param: str) -> int | None:
+        return self._preferred.get(param)
+
+    def record_match(self, param: str, index: int | None) -> None:
+        if index is not None:
+            self._preferred[param] = index
+
+
+_xpath_template_sets: dict[frozenset, XpathTemplateSet] = {}
+_xpath_template_sets_lock = threading.Lock()
+
+
+def get_xpath_template_set(parametric_xpaths) -> XpathTemplateSet | None:
+    """
+    Return the cached template set of the parametric xpaths, or None if there is no xpath.
+    """
+    if len(parametric_xpaths) == 0:
+        return None
+    template_key = frozenset(parametric_xpaths)
+    template_set = _xpath_template_sets.get(template_key)
+    if template_set is None:
+        with _xpath_template_sets_lock:
+            template_set = _xpath_template_sets.setdefault(template_key, XpathTemplateSet(template_key))
+    return template_set
+
+
+def find_parametric_element(driver: Chrome, template_set: XpathTemplateSet, param: str) -> WebElement:
+    """
+    Find the element of a parametric xpath set with one script call. The previously matching alternative
+    is tried first, otherwise the first element of the union in document order is returned.
+    If the element isn't present yet, it falls back to find_element, which uses the implicit wait.
+    """
+    alternatives: tuple[str, ...] = template_set.alternatives(param)
+    found = driver.execute_script(_FIND_PARAMETRIC_ELEMENT_SCRIPT, list(alternatives),
+                                  template_set.preferred_index(param), None)
+    if found is None:
+        element: WebElement = driver.find_element(by=By.XPATH, value=template_set.union(param))
+        found = driver.execute_script(_FIND_PARAMETRIC_ELEMENT_SCRIPT, list(alternatives), None, element)
+        if found is None:
+            return element
+    element, matched_index = found
+    template_set.record_match(param, matched_index)
+    return element
+
+
+class ElementCache:
+    """
+    Per-page cache of the found webelements keyed by the resolved xpath. It is off by default.
+    If a cached element became stale, it is found again and the action is repeated on the new element.
+
+    Example:
+        cache = ElementCache(driver, enabled=True)
+        cache.run("//button[text()='Save']", lambda button: button.click())
+        cache.metrics()
+    """
+
+    def __init__(self, driver: Chrome, enabled: bool = False):
+        self.driver: Chrome = driver
+        self.enabled: bool = enabled
+        self.hits: int = 0
+        self.misses: int = 0
+        self.stale_refinds: int = 0
+        self.invalidations: int = 0
+        self._elements: dict[str, WebElement] = {}
+
+    def run(self, xpath: str, action: Callable[[WebElement], object],
+            finder: Callable[[], WebElement] = None) -> object:
+        """
+        Run the action on the element of the xpath and return the action's result.
+
+        Arguments:
+            xpath: the key of the element. It is also used to find the element, if the finder is None.
+            action: it gets the found element.
+            finder: a custom way to find the element, for example with the parametric xpath alternatives.
+        """
+        finder = (lambda: self.driver.find_element(by=By.XPATH, value=xpath)) if finder is None else finder
+        if not self.enabled:
+            return action(finder())
+
+        element: WebElement = self._elements.get(xpath)
+        if element is None:
+            self.misses += 1
+            element = finder()
+            self._elements[xpath] = element
+            return action(element)
+
+        self.hits += 1
+        try:
+            return action(element)
+        except exceptions.StaleElementReferenceException:
+            self.stale_refinds += 1
+            element = finder()
+            self._elements[xpath] = element
+            return action(element)
+
+    def find(self, xpath: str, finder: Callable[[], WebElement] = None) -> WebElement:
+        return self.run(xpath, lambda element: element, finder=finder)
+
+    def invalidate(self) -> None:
+        if len(self._elements) != 0:
+            self.invalidations += 1
+            self._elements.clear()
+
+    def hit_rate(self) -> float:
+        lookups: int = self.hits + self.misses
+        return self.hits / lookups if lookups != 0 else 0.0
+
+    def metrics(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "stale_refinds": self.stale_refinds,
+                "invalidations": self.invalidations, "hit_rate": self.hit_rate()}
+
+
+def _click_element(element: WebElement) -> WebElement:
+    element.click()
+    return element
+
+
 class ClickMethods:
     global_click_xpaths: set[str] = {}
 
@@ -183,9 +614,7 @@ class ClickMethods:
                 xpath = f"//*[text()='{identifier}']"
             case (True, True):
                 xpath = f"//*[contains(text(),'{identifier}')]"
-        clickable_webelement: WebElement = self.driver.find_element(by=By.XPATH, value=xpath)
-        clickable_webelement.click()
-        return clickable_webelement
+        return self.element_cache.run(xpath, _click_element)
 
     def click_by_param(self, identifier: str, xpath: str = None) -> WebElement:
         """
@@ -209,14 +638,13 @@ class ClickMethods:
         examples:
 
         """
-        created_click_xpath: str = self._create_click_xpath(identifier)
+        template_set: XpathTemplateSet = self._get_click_template_set()
         if xpath is not None:
-            created_click_xpath = xpath.replace(InnerStatics.PARAM.value, identifier)
-        elif created_click_xpath == "" and xpath is None:
+            return self.element_cache.run(xpath.replace(InnerStatics.PARAM.value, identifier), _click_element)
+        elif template_set is None:
             raise TypeError("None value in argument: 'parametric_xpath'")
-        clickable_webelement = self.driver.find_element(by=By.XPATH, value=created_click_xpath)
-        clickable_webelement.click()
-        return clickable_webelement
+        return self.element_cache.run(template_set.union(identifier), _click_element,
+                                      finder=lambda: find_parametric_element(self.driver, template_set, identifier))
 
     def click_by_webelement(self, webelement: WebElement, identifier: str = "") -> WebElement:
         """
@@ -270,26 +698,21 @@ class ClickMethods:
 
         if identifier is not None:
             xpath = f"//*[text()='{identifier}']"
-        clickable_webelement = self.driver.find_element(by=By.XPATH, value=xpath)
+        clickable_webelement: WebElement = self.element_cache.find(xpath)
         MiUsIn.action_driver.double_click(on_element=clickable_webelement).perform()
 
         return clickable_webelement
 
-    def _create_click_xpath(self, param: str):
+    def _get_click_template_set(self) -> XpathTemplateSet | None:
         if len(self.local_click_xpaths) != 0:
-            field_xpaths: set[str] = set(
-                parametric_xpath.replace(InnerStatics.PARAM.value, param) for parametric_xpath in
-                self.local_click_xpaths)
-            return "|".join(field_xpaths)
-
-        elif len(MiUsIn.global_click_xpaths) != 0:
-            field_xpaths: set[str] = set(
-                parametric_xpath.replace(InnerStatics.PARAM.value, param) for parametric_xpath in
-                MiUsIn.global_click_xpaths)
-            return "|".join(field_xpaths)
+            return get_xpath_template_set(self.local_click_xpaths)
+        return get_xpath_template_set(MiUsIn.global_click_xpaths)
 
-        else:
+    def _create_click_xpath(self, param: str):
+        template_set: XpathTemplateSet = self._get_click_template_set()
+        if template_set is None:
             return ""
+        return template_set.union(param)
 
 
 class FieldMethods:
@@ -318,12 +741,7 @@ class FieldMethods:
 
         if data is None:
             return
-        field = self.driver.find_element(by=By.XPATH, value=xpath)
-        field.click()
-        field.clear()
-        field.send_keys(data)
-
-        return field
+        return self.element_cache.run(xpath, lambda field: _fill_element(field, data))
 
     def fill_field_by_param(self, identifier: str, xpath: str = None, data="") -> WebElement:
         """
@@ -345,17 +763,7 @@ class FieldMethods:
         """
         if data is None:
             return
-        created_field_xpath: str = self._create_field_xpath(identifier)
-        if xpath is not None:
-            created_field_xpath = xpath.replace(InnerStatics.PARAM.value, identifier)
-        elif created_field_xpath == "" and xpath is None:
-            raise TypeError("None value in field: 'field_xpath'")
-        field = self.driver.find_element(by=By.XPATH, value=created_field_xpath)
-        field.click()
-        field.clear()
-        field.send_keys(data)
-
-        return field
+        return self._run_on_parametric_field(identifier, lambda field: _fill_element(field, data), xpath=xpath)
 
     def fill_form(self, **kwargs):
         """
@@ -370,18 +778,68 @@ class FieldMethods:
             self.fill_field_by_param(identifier=str(key).replace("_", " "), data=value)
         return kwargs
 
-    def _create_field_xpath(self, param: str):
+    def fill_form_batched(self, fields: dict, keystroke_fields=()) -> dict:
+        """
+        Fill many fields of a form in one browser round-trip. The values are set by script
+        and input and change events are dispatched, like a real user input.
+        The fields in the keystroke_fields, the fields that aren't found yet, and the fields that
+        can't be set by script (selects, checkboxes, file inputs, custom widgets, and the inputs that sanitise
+        the value, like a date input with "1992.01.20") are filled with the fill_field_by_param.
+        The field names are the same as the fill_form's keyword names.
+
+        Arguments:
+            fields: the fieldnames and the input datas.
+            keystroke_fields: the fieldnames that need real keystrokes, for example fields with key listeners.
+
+        Example:
+            fill_form_batched({"Name": "John Doe", "Date_of_birth": "1992.01.20"}, keystroke_fields={"Name"})
+        """
+        template_set: XpathTemplateSet = self._get_field_template_set()
+        if template_set is None:
+            raise TypeError("None value in field: 'field_xpath'")
+        batched_fields: list[tuple[str, str]] = [
+            (str(key).replace("_", " "), value) for key, value in fields.items()
+            if value is not None and key not in keystroke_fields]
+        batch_results: list = self.driver.execute_script(_FILL_FORM_SCRIPT, [
+            [list(template_set.alternatives(identifier)), template_set.preferred_index(identifier), str(value)]
+            for identifier, value in batched_fields])
+
+        filled_identifiers: set[str] = set()
+        for (identifier, _), (status, matched_index) in zip(batched_fields, batch_results):
+            template_set.record_match(identifier, matched_index)
+            if status == "filled":
+                filled_identifiers.add(identifier)
+        for key, value in fields.items():
+            if str(key).replace("_", " ") not in filled_identifiers:
+                self.fill_field_by_param(identifier=str(key).replace("_", " "), data=value)
+        return fields
+
+    def _get_field_template_set(self) -> XpathTemplateSet | None:
         if len(self.local_field_xpaths) != 0:
-            field_xpaths = [field_findig_method.replace(InnerStatics.PARAM.value, param) for field_findig_method in
-                            self.local_field_xpaths]
-            return "|".join(field_xpaths)
-
-        elif len(MiUsIn.global_field_xpaths) != 0:
-            field_xpaths = [field_findig_method.replace(InnerStatics.PARAM.value, param) for field_findig_method in
-                            MiUsIn.global_field_xpaths]
-            return "|".join(field_xpaths)
-        else:
+            return get_xpath_template_set(self.local_field_xpaths)
+        return get_xpath_template_set(MiUsIn.global_field_xpaths)
+
+    def _create_field_xpath(self, param: str):
+        template_set: XpathTemplateSet = self._get_field_template_set()
+        if template_set is None:
             return ""
+        return template_set.union(param)
+
+    def _find_parametric_field(self, identifier: str, xpath: str = None) -> WebElement:
+        """
+        Find a field by the given parametric xpath, or by the case level or global field xpaths.
+        """
+        return self._run_on_parametric_field(identifier, lambda field: field, xpath=xpath)
+
+    def _run_on_parametric_field(self, identifier: str, action: Callable[[WebElement], object],
+                                 xpath: str = None) -> object:
+        template_set: XpathTemplateSet = self._get_field_template_set()
+        if xpath is not None:
+            return self.element_cache.run(xpath.replace(InnerStatics.PARAM.value, identifier), action)
+        elif template_set is None:
+            raise TypeError("None value in field: 'field_xpath'")
+        return self.element_cache.run(template_set.union(identifier), action,
+                                      finder=lambda: find_parametric_element(self.driver, template_set, identifier))
 
     def insert_file_path(self, data: str, xpath: str = "//input[@type='file']"):
         """
@@ -409,8 +867,18 @@ class FieldMethods:
         file_path_field.send_keys(file_path)
 
 
+def _fill_element(field: WebElement, data: str) -> WebElement:
+    field.click()
+    field.clear()
+    field.send_keys(data)
+    return field
+
+
 class ValueValidation(FieldMethods):
     global_webalert_xpath: str = None
+    event_driven_waits: bool = True
+    poll_frequency_in_seconds: float = 0.5
+    event_fallback_interval_in_seconds: float = 0.1
 
     def __init__(self):
         pass
@@ -455,6 +923,21 @@ class ValueValidation(FieldMethods):
 
        """
 
+        if self.event_driven_waits and expected_condition is None:
+            event_condition: str = None
+            if webelement_is_visible:
+                event_condition = "visible"
+            elif webelement_is_clickable:
+                event_condition = "clickable"
+            elif alert is not None:
+                xpath = MiUsIn._create_alert_xpath(alert)
+                event_condition = "visible"
+            if event_condition is not None:
+                event_result: bool | None = self.wait_for_xpath(xpath=xpath, timeout_in_seconds=timeout_in_seconds,
+                                                                condition=event_condition, until_not=until_not)
+                if event_result is not None:
+                    return event_result
+
         chosen_expected_condition = None
         result: bool = False
         current_value_of_implicit_wait: float = self.driver.timeouts.implicit_wait
@@ -471,11 +954,13 @@ class ValueValidation(FieldMethods):
 
         try:
             if not until_not:
-                result = WebDriverWait(driver=self.driver, timeout=timeout_in_seconds).until(chosen_expected_condition)
+                result = WebDriverWait(driver=self.driver, timeout=timeout_in_seconds,
+                                       poll_frequency=self.poll_frequency_in_seconds).until(chosen_expected_condition)
                 result = True
 
             elif until_not:
-                result = WebDriverWait(driver=self.driver, timeout=timeout_in_seconds).until_not(
+                result = WebDriverWait(driver=self.driver, timeout=timeout_in_seconds,
+                                       poll_frequency=self.poll_frequency_in_seconds).until_not(
                     chosen_expected_condition)
                 result = True
 
@@ -486,6 +971,74 @@ class ValueValidation(FieldMethods):
             self.driver.implicitly_wait(current_value_of_implicit_wait)
             return result
 
+    def wait_for_xpath(self, xpath: str, timeout_in_seconds: float, condition: str = "present",
+                       until_not: bool = False) -> bool | None:
+        """
+        Wait for an element with a MutationObserver in the page. It returns as soon as the condition is met,
+        there is no polling delay. A fallback check runs every event_fallback_interval_in_seconds
+        for the changes that are not mutations, like css animations.
+
+        Arguments:
+            xpath: the webelement's xpath.
+            timeout_in_seconds: the maximum waiting time.
+            condition: "present", "visible" or "clickable"
+            until_not: wait for the negation of the condition, for example the disappearance of the element.
+
+        Return:
+            True if the condition is met, False on timeout,
+            None if the page navigated away during the wait and the result is unknown.
+        """
+        try:
+            with self._script_timeout(timeout_in_seconds + 1):
+                return self.driver.execute_async_script(_WAIT_FOR_XPATH_SCRIPT, xpath, condition, until_not,
+                                                        int(timeout_in_seconds * 1000),
+                                                        int(self.event_fallback_interval_in_seconds * 1000))
+        except WebDriverException:
+            return None
+
+    @contextmanager
+    def _script_timeout(self, timeout_in_seconds: float):
+        """
+        Set the script timeout of the driver inside the with block, and restore the previous value after it.
+        """
+        previous_timeout: float = self.driver.timeouts.script
+        self.driver.set_script_timeout(timeout_in_seconds)
+        try:
+            yield
+        finally:
+            self.driver.set_script_timeout(previous_timeout)
+
+    def install_network_idle_tracker(self) -> None:
+        """
+        Count the pending fetch and XMLHttpRequest calls of the page, so the wait_for_network_idle can work.
+        On chrome the counter is installed into every new document before the page's own scripts,
+        otherwise only into the current document.
+        """
+        try:
+            self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": _NETWORK_TRACKER_SCRIPT})
+        except (AttributeError, WebDriverException):
+            pass
+        self.driver.execute_script(_NETWORK_TRACKER_SCRIPT)
+
+    def wait_for_network_idle(self, idle_time_in_seconds: float = 0.5, timeout_in_seconds: float = 10) -> bool:
+        """
+        Wait till there is no pending fetch or XMLHttpRequest call for idle_time_in_seconds.
+        If the tracker isn't installed in the page yet, it is installed first.
+
+        Return:
+            True if the network became idle, False on timeout.
+        """
+        idle_time_in_ms: int = int(idle_time_in_seconds * 1000)
+        timeout_in_ms: int = int(timeout_in_seconds * 1000)
+        with self._script_timeout(timeout_in_seconds + 1):
+            result: bool | None = self.driver.execute_async_script(_WAIT_FOR_NETWORK_IDLE_SCRIPT, idle_time_in_ms,
+                                                                   timeout_in_ms)
+            if result is None:
+                self.driver.execute_script(_NETWORK_TRACKER_SCRIPT)
+                result = self.driver.execute_async_script(_WAIT_FOR_NETWORK_IDLE_SCRIPT, idle_time_in_ms,
+                                                          timeout_in_ms)
+        return result
+
     def get_css_attribute(self, xpath: str, attribute: str) -> str:
         """
         return a selected attribute of a webelement
@@ -494,10 +1047,7 @@ class ValueValidation(FieldMethods):
             xpath: the webelement's xpath
             attribute: teh attribute of the webelement you want to get
         """
-        atr_value = None
-
-        webelement = self.driver.find_element(By.XPATH, value=xpath)
-        atr_value = webelement.value_of_css_property(attribute)
+        atr_value = self.element_cache.run(xpath, lambda webelement: webelement.value_of_css_property(attribute))
 
         return atr_value
 
@@ -541,7 +1091,7 @@ class ValueValidation(FieldMethods):
         if by_label is not None:
             xpath = f"//*[text()='{by_label}']"
 
-        text: str = self.driver.find_element(By.XPATH, value=xpath).text
+        text: str = self.element_cache.run(xpath, lambda webelement: webelement.text)
 
         return text
 
@@ -550,7 +1100,7 @@ class ValueValidation(FieldMethods):
         if by_label is not None:
             xpath = f"//*[text()='{by_label}']"
 
-        text: str = self.driver.find_element(By.XPATH, value=xpath).get_property("value")
+        text: str = self.element_cache.run(xpath, lambda webelement: webelement.get_property("value"))
 
         return text
 
@@ -608,12 +1158,8 @@ class ValueValidation(FieldMethods):
             skip: if true, the method return without any action.
 
         """
-        created_field_xpath: str = self._create_field_xpath(identifier)
-        if xpath is not None:
-            created_field_xpath = xpath.replace(InnerStatics.PARAM.value, identifier)
-        elif created_field_xpath == "" and xpath is None:
-            raise TypeError("None value in field: 'field_xpath'")
-        actual_value: str = MiUsIn.get_field_text(xpath=created_field_xpath, by_label=None)
+        actual_value: str = self._run_on_parametric_field(identifier, lambda field: field.get_property("value"),
+                                                          xpath=xpath)
         if data is None:
             data = ""
         if actual_value == data:
@@ -636,10 +1182,38 @@ class ValueValidation(FieldMethods):
 
         return result
 
+    def match_form_field_values_batched(self, fields: dict) -> dict[str:bool]:
+        """
+        Check the values of many fields of a form in one browser round-trip.
+        The fields that aren't found yet are checked one by one, waiting for them with the implicit wait.
+        The field names are the same as the match_form_field_values' keyword names.
+
+        Example:
+            match_form_field_values_batched({"Name": "John Doe", "Date_of_birth": "1992.01.20"})
+        """
+        template_set: XpathTemplateSet = self._get_field_template_set()
+        if template_set is None:
+            raise TypeError("None value in field: 'field_xpath'")
+        identifiers: list[str] = [str(key).replace("_", " ") for key in fields.keys()]
+        batch_results: list = self.driver.execute_script(_READ_FORM_SCRIPT, [
+            [list(template_set.alternatives(identifier)), template_set.preferred_index(identifier)]
+            for identifier in identifiers])
+
+        result: dict[str:bool] = dict()
+        for (key, value), identifier, (status, matched_index, actual_value) in zip(fields.items(), identifiers,
+                                                                                   batch_results):
+            if status == "missing":
+                result.update({key: self.parametric_field_value_match(identifier=identifier, data=value)})
+                continue
+            template_set.record_match(identifier, matched_index)
+            result.update({key: actual_value == ("" if value is None else value)})
+        return result
+
     def wait_till_website_ready(self, timeout: float = 10, identifier: str = "Not specified"):
 
         """
         Wait till the website is fully loaded. It use the readyState document.
+        If the event_driven_waits is true, it returns at the load event instead of polling the readyState.
         If the website doesn't load under the timeout parameter, it recognised and logged as an error.
 
         Special Keywords:
@@ -656,6 +1230,17 @@ class ValueValidation(FieldMethods):
             identifier: you can describe the website or website part that you check the loading time.
         """
 
+        if self.event_driven_waits:
+            try:
+                with self._script_timeout(timeout + 1):
+                    loaded: bool = self.driver.execute_async_script(_WAIT_FOR_LOAD_SCRIPT, int(timeout * 1000))
+            except WebDriverException:
+                loaded = None
+            if loaded is False:
+                raise WebDriverException("Website not fully loaded within the specified timeout period")
+            if loaded:
+                return
+
         @Utimer.bomb(timeout_in_seconds=timeout)
         def get_ready_state():
             state: bool = self.driver.execute_script("return document.readyState") == "complete"
@@ -751,6 +1336,7 @@ class NavigationMethods:
         """
         the browser navigate to the desired url.
         """
+        self.element_cache.invalidate()
         self.driver.get(url)
 
     @staticmethod
@@ -768,6 +1354,7 @@ class NavigationMethods:
         current_window_handle = self.driver.current_window_handle
         recent_window = self.driver.window_handles[-1]
         if current_window_handle != recent_window:
+            self.element_cache.invalidate()
             self.driver.switch_to.window(recent_window)
 
             return True
@@ -790,17 +1377,238 @@ class NavigationMethods:
 
 
 class DriverManagement:
+    resource_type_url_patterns: dict[str, tuple[str, ...]] = {
+        "image": ("*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*"),
+        "font": ("*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"),
+        "media": ("*.mp4*", "*.webm*", "*.ogg*", "*.mp3*", "*.wav*", "*.m3u8*"),
+        "stylesheet": ("*.css*",),
+        "tracker": ("*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*",
+                    "*hotjar.com*", "*segment.io*", "*googlesyndication.com*")}
+    blocked_url_patterns: tuple[str, ...] = ()
+    _response_stub_script_ids: tuple[str, ...] = ()
+    lean_chrome_arguments: tuple[str, ...] = ("--disable-extensions", "--disable-gpu", "--disable-dev-shm-usage",
+                                              "--no-first-run", "--no-default-browser-check",
+                                              "--disable-background-networking")
+    startup_metrics: list[DriverStartupMetrics] = []
 
     def __init__(self, driver: Chrome):
         self.driver: Chrome = driver
         self.action_driver: ActionChains = ActionChains(driver=self.driver)
 
+    @staticmethod
+    def create_driver(headless: bool = True, window_size: tuple[int, int] = (1920, 1080),
+                      page_load_strategy: str = "eager", chromedriver_path: str = None,
+                      allow_download: bool = False, extra_arguments=()) -> Chrome:
+        """
+        Create a resource-lean chrome driver. The window has a fixed size instead of a maximized window,
+        and the page loads return at DOMContentLoaded with the eager page load strategy.
+        The startup times are appended to the DriverManagement.startup_metrics.
+
+        Arguments:
+            headless: if true, the browser runs without a visible window.
+            window_size: the fixed (width, height) of the window.
+            page_load_strategy: "normal", "eager" or "none"
+            chromedriver_path: the chromedriver binary, see the resolve_chromedriver.
+            allow_download: if true and there is no local chromedriver, it is downloaded with the webdriver_manager.
+                    Otherwise the Selenium Manager resolves the driver.
+            extra_arguments: other chrome command line arguments.
+
+        Example:
+            miusin = MiUsIn(driver=DriverManagement.create_driver(), fullsize_windows=False)
+        """
+        resolution_start: float = perf_counter()
+        resolved_chromedriver_path: str = DriverManagement.resolve_chromedriver(chromedriver_path=chromedriver_path,
+                                                                                allow_download=allow_download)
+        driver_resolution_time: float = perf_counter() - resolution_start
+
+        options = ChromeOptions()
+        if headless:
+            options.add_argument("--headless=new")
+        options.add_argument(f"--window-size={window_size[0]},{window_size[1]}")
+        for argument in (*DriverManagement.lean_chrome_arguments, *extra_arguments):
+            options.add_argument(argument)
+        options.page_load_strategy = page_load_strategy
+
+        launch_start: float = perf_counter()
+        service = Service() if resolved_chromedriver_path is None \
+            else Service(executable_path=resolved_chromedriver_path)
+        driver = Chrome(service=service, options=options)
+        DriverManagement.startup_metrics.append(
+            DriverStartupMetrics(chromedriver_path=getattr(driver.service, "path", None) or "", headless=headless,
+                                 driver_resolution_time=round(driver_resolution_time, 3),
+                                 browser_launch_time=round(perf_counter() - launch_start, 3)))
+        return driver
+
+    @staticmethod
+    def resolve_chromedriver(chromedriver_path: str = None, allow_download: bool = False) -> str | None:
+        """
+        Return a local chromedriver binary without network access. The order of the search:
+            - the chromedriver_path argument
+            - the LIGHTTEST_CHROMEDRIVER environment variable
+            - the chromedriver on the PATH
+            - the driver in the webdriver_manager cache (~/.wdm) with the same major version as the installed chrome
+        If there is no local chromedriver and allow_download is true, it is downloaded with the webdriver_manager.
+
+        Return:
+            the path of the chromedriver, or None if there is no local chromedriver and the download is not allowed.
+            In this case the create_driver leaves the driver resolution to the Selenium Manager.
+        """
+        for candidate in (chromedriver_path, os.environ.get("LIGHTTEST_CHROMEDRIVER")):
+            if candidate:
+                return candidate
+
+        driver_name: str = "chromedriver.exe" if os.name == "nt" else "chromedriver"
+        path_driver: str = shutil.which(driver_name)
+        if path_driver is not None:
+            return path_driver
+
+        chrome_major_version: str | None = _installed_chrome_major_version()
+        if chrome_major_version is not None:
+            cache_directory: Path = Path.home() / ".wdm" / "drivers" / "chromedriver"
+            matching_drivers: list[Path] = [
+                cached_driver for cached_driver in cache_directory.glob(f"**/{driver_name}")
+                if cached_driver.is_file() and _cached_driver_major_version(cached_driver, cache_directory)
+                == chrome_major_version]
+            if len(matching_drivers) != 0:
+                return str(max(matching_drivers, key=lambda cached_driver: cached_driver.stat().st_mtime))
+
+        if not allow_download:
+            return None
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        return ChromeDriverManager().install()
+
     def set_implicitly_wait(self, time_to_wait: float) -> None:
         """
         for every event (example: find a webelement), the webdriver will wait till maximum the value of the time_to_wait
         """
         self.driver.implicitly_wait(time_to_wait=time_to_wait)
 
+    def block_requests(self, url_patterns=(), resource_types=()) -> tuple[str, ...]:
+        """
+        Block the requests of the browser by url pattern or by resource type, so the pages load only
+        what the test needs. It replaces the previously blocked patterns. It works only with chrome.
+
+        Arguments:
+            url_patterns: url patterns, '*' matches any character sequence. For example: "*.example-cdn.com/*"
+            resource_types: the keys of the resource_type_url_patterns: image, font, media, stylesheet, tracker.
+                    The resource types are recognised by the url, for example the images by the file extension.
+
+        Return:
+            the blocked url patterns.
+
+        Example:
+            miusin.block_requests(resource_types=["image", "font", "tracker"])
+        """
+        blocked_url_patterns: list[str] = list(url_patterns)
+        for resource_type in resource_types:
+            if resource_type not in self.resource_type_url_patterns:
+                raise ValueError(f"Unknown resource type: '{resource_type}'")
+            blocked_url_patterns.extend(self.resource_type_url_patterns[resource_type])
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_url_patterns})
+        self.blocked_url_patterns = tuple(blocked_url_patterns)
+        return self.blocked_url_patterns
+
+    def unblock_requests(self) -> None:
+        self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+        self.blocked_url_patterns = ()
+
+    def stub_responses(self, stubs: dict[str, str | Path], status: int = 200) -> None:
+        """
+        Answer the fetch and XMLHttpRequest calls of the pages from local files instead of the server.
+        The stubs are active in every page loaded after this call and in the current page.
+        It replaces the previous stubs. It works only with chrome.
+
+        Arguments:
+            stubs: url patterns and the paths of the response files. '*' matches any character sequence.
+                    The content type is guessed from the file extension.
+            status: the http status code of the stubbed responses.
+
+        Example:
+            miusin.stub_responses({"*/api/users*": "stubs/users.json"})
+        """
+        self.clear_response_stubs()
+        stub_list: list[list] = []
+        for url_pattern, file_path in stubs.items():
+            content_type: str = mimetypes.guess_type(str(file_path))[0] or "application/octet-stream"
+            stub_list.append([_url_pattern_to_regex(url_pattern),
+                              base64.b64encode(Path(file_path).read_bytes()).decode("ascii"), content_type, status])
+        stub_script: str = _RESPONSE_STUB_SCRIPT.replace("__stubs__", json.dumps(stub_list))
+        script_id: str = self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument",
+                                                     {"source": stub_script})["identifier"]
+        self._response_stub_script_ids = (script_id,)
+        self.driver.execute_script(stub_script)
+
+    def clear_response_stubs(self) -> None:
+        """
+        Remove the response stubs from the pages loaded after this call.
+        """
+        for script_id in self._response_stub_script_ids:
+            self.driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": script_id})
+        self._response_stub_script_ids = ()
+
+    def warm_http_cache(self, *urls: str) -> None:
+        """
+        Load the pages once, so their static resources are in the browser's http cache
+        and the measured page loads of the test don't download them again.
+        The browser stays on the last page.
+
+        Example:
+            miusin.warm_http_cache("https://example.com/login", "https://example.com/dashboard")
+        """
+        try:
+            self.driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": False})
+        except (AttributeError, WebDriverException):
+            pass
+        for url in urls:
+            self.jump_webpage(url)
+            self.wait_till_website_ready()
+
+
+_CHROME_BINARIES: tuple[str, ...] = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+_VERSION_PATTERN = re.compile(r"(\d+)\.\d+\.\d+")
+
+
+@lru_cache(maxsize=None)
+def _installed_chrome_major_version() -> str | None:
+    """
+    Return the major version of the chrome on the PATH, or None if it can't be determined.
+    The result is cached, so the chrome process is started only once, not at every create_driver call.
+    """
+    for chrome_binary in _CHROME_BINARIES:
+        chrome_path: str = shutil.which(chrome_binary)
+        if chrome_path is None:
+            continue
+        try:
+            version_output: str = subprocess.run([chrome_path, "--version"], capture_output=True, text=True,
+                                                 timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        version_match = _VERSION_PATTERN.search(version_output)
+        if version_match is not None:
+            return version_match.group(1)
+    return None
+
+
+def _cached_driver_major_version(cached_driver: Path, cache_directory: Path) -> str | None:
+    """
+    Return the major version of a driver in the webdriver_manager cache from its version directory,
+    for example: ~/.wdm/drivers/chromedriver/linux64/124.0.6367.91/chromedriver-linux64/chromedriver
+    """
+    for directory_name in cached_driver.relative_to(cache_directory).parts:
+        version_match = _VERSION_PATTERN.match(directory_name)
+        if version_match is not None:
+            return version_match.group(1)
+    return None
+
+
+def _url_pattern_to_regex(url_pattern: str) -> str:
+    """
+    Return the javascript regex source of a url pattern, where '*' matches any character sequence.
+    """
+    return "^" + ".*".join(re.escape(part) for part in url_pattern.split("*")) + "$"
+
 
 class MiUsIn(CaseManagement, ValueValidation, ClickMethods, DropDownMethods, NavigationMethods, DriverManagement):
     """
@@ -813,14 +1621,15 @@ class MiUsIn(CaseManagement, ValueValidation, ClickMethods, DropDownMethods, Nav
     """
 
     def __init__(self, driver: Chrome, fullsize_windows=True,
-                 screenshots_container_directory: str = "C:\Screenshots"):
+                 screenshots_container_directory: str = None):
         """
         placeholder
 
         Arguments:
             fullsize_windows: If true, the browser's windows will b full-sized
             screenshots_container_directory: If during a testcase it find an error
-                    the screenshot taken of the error will be stored and catalogised in that directory
+                    the screenshot taken of the error will be stored and catalogised in that directory.
+                    Default: the LIGHTTEST_SCREENSHOTS_DIR environment variable or ~/lighttest_screenshots
         """
         super().__init__(screenshots_container_directory=screenshots_container_directory, driver=driver)
         self.driver.implicitly_wait(time_to_wait=5)
@@ -841,9 +1650,11 @@ class MiUsIn(CaseManagement, ValueValidation, ClickMethods, DropDownMethods, Nav
     def _take_a_screenshot(self):
         """
         Take a screenshot and save it in a directory structure.
+        Only the capture runs on the test thread, the encoding and the saving are done by the screenshot_writer.
+        If the screenshot_writer is None, the shared png writer is used.
 
         directory structure:
-            C:/screenshots/automatically generated project directory from the webpage URL/
+            screenshots_container_directory/automatically generated project directory from the webpage URL/
             generated date directory/generated hour directory/screenshot.png
         """
         project_name = self.driver.current_url \
@@ -852,10 +1663,11 @@ class MiUsIn(CaseManagement, ValueValidation, ClickMethods, DropDownMethods, Nav
             .replace(".", "_") \
             .replace("www_", "")
 
-        file_name: str = f'{date_methods.get_current_time()}.png'
-        create_logging_directory(self.screenshots_container_directory, project_name)
-        screenshot_path = create_logging_structure(self.screenshots_container_directory, project_name)
-        self.driver.save_screenshot(f"{screenshot_path.absolute()}/{file_name}")
+        file_name: str = f'{date_methods.get_current_time()}'
+        screenshot_writer: ScreenshotWriter = default_screenshot_writer() if self.screenshot_writer is None \
+            else self.screenshot_writer
+        screenshot_writer.submit(self.driver.get_screenshot_as_png(), self.screenshots_container_directory,
+                                 project_name, file_name)
 
     def casebreak_alarm(self, critical_step: bool):
         if critical_step:
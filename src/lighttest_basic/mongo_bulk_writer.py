@@ -0,0 +1,186 @@
+"""
+A teszteredmények pufferelt, háttérszálon futó tömeges mentése a mongoDB-be
+"""
+import atexit
+import queue
+import threading
+import weakref
+from collections.abc import Mapping
+from dataclasses import asdict, is_dataclass
+from time import monotonic
+
+from bson import encode
+from bson.errors import InvalidDocument
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from lighttest_basic.datacollections import Record
+from lighttest_basic.mongo_cache import query_cache
+from lighttest_basic.mongo_connection import Mongo as con
+
+_FLUSH = object()
+_STOP = object()
+_open_writers: weakref.WeakSet = weakref.WeakSet()
+
+
+class BulkWriter:
+    """
+    Buffer the documents and insert them on a worker thread with unordered bulk_write calls.
+    A batch is written when it reaches max_batch_size or when flush_interval_in_seconds has passed.
+    If the queue is full, write() blocks until the worker catches up. Every open writer is flushed at exit.
+
+    Example:
+        writer = BulkWriter(collection="case_steps")
+        writer.write(case_step)
+        writer.flush()
+    """
+
+    def __init__(self, collection: str = "", database: str = None, max_batch_size: int = 500,
+                 flush_interval_in_seconds: float = 1.0, max_queue_size: int = 10000,
+                 put_timeout_in_seconds: float = None):
+        """
+        Arguments:
+            collection: the default collection of the written documents. If empty, the current collection is used.
+            database: the default database of the written documents. If None, the current database is used.
+            max_batch_size: the maximum number of documents in one bulk_write.
+            flush_interval_in_seconds: the maximum time a document waits in the buffer.
+            max_queue_size: the maximum number of queued documents. Above this the write() blocks.
+            put_timeout_in_seconds: the maximum blocking time of write(). If None, it waits without limit.
+        """
+        self.collection: str = collection
+        self.database: str = database
+        self.max_batch_size: int = max_batch_size
+        self.flush_interval_in_seconds: float = flush_interval_in_seconds
+        self.put_timeout_in_seconds: float = put_timeout_in_seconds
+        self.written_count: int = 0
+        self.write_errors: list[dict] = []
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._closed: bool = False
+        self._worker = threading.Thread(target=self._run, name="lighttest-bulk-writer", daemon=True)
+        self._worker.start()
+        _open_writers.add(self)
+
+    def write(self, document, collection: str = "", database: str = None) -> None:
+        """
+        Queue a document for writing. Records and dataclasses are converted to dictionaries.
+
+        Raise:
+            queue.Full: if the queue is still full after put_timeout_in_seconds.
+        """
+        if self._closed:
+            raise RuntimeError("The bulk writer is closed")
+        target: tuple[str, str] = (database or self.database or con.current_database,
+                                   collection or self.collection or con.current_collection)
+        self._queue.put((target, _to_document(document)), timeout=self.put_timeout_in_seconds)
+
+    def write_many(self, documents, collection: str = "", database: str = None) -> None:
+        for document in documents:
+            self.write(document, collection=collection, database=database)
+
+    def flush(self) -> None:
+        """
+        Write every queued document and wait till they are stored.
+        """
+        if self._closed:
+            return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self) -> None:
+        """
+        Flush the queued documents and stop the worker thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._worker.join()
+        _open_writers.discard(self)
+
+    def _run(self) -> None:
+        pending: dict[tuple[str, str], list[dict]] = {}
+        pending_count: int = 0
+        deadline: float = monotonic() + self.flush_interval_in_seconds
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - monotonic(), 0))
+            except queue.Empty:
+                self._write_pending(pending)
+                pending_count = 0
+                deadline = monotonic() + self.flush_interval_in_seconds
+                continue
+
+            if item is _FLUSH or item is _STOP:
+                try:
+                    self._write_pending(pending)
+                finally:
+                    self._queue.task_done()
+                pending_count = 0
+                deadline = monotonic() + self.flush_interval_in_seconds
+                if item is _STOP:
+                    return
+                continue
+
+            target, document = item
+            pending.setdefault(target, []).append(document)
+            pending_count += 1
+            if pending_count >= self.max_batch_size:
+                self._write_pending(pending)
+                pending_count = 0
+                deadline = monotonic() + self.flush_interval_in_seconds
+
+    def _write_pending(self, pending: dict[tuple[str, str], list[dict]]) -> None:
+        for (database, collection), documents in pending.items():
+            try:
+                operations: list[InsertOne] = []
+                for document in documents:
+                    encoding_error: str = _encoding_error(document)
+                    if encoding_error is None:
+                        operations.append(InsertOne(document))
+                    else:
+                        self.write_errors.append({"collection": collection, "lost_documents": 1,
+                                                  "errmsg": encoding_error})
+                if len(operations) == 0:
+                    continue
+                target_collection = con.get_collection(collection, database)
+                target_collection.bulk_write(operations, ordered=False)
+                query_cache.invalidate(target_collection.full_name)
+                self.written_count += len(operations)
+            except BulkWriteError as bulk_error:
+                self.written_count += bulk_error.details.get("nInserted", 0)
+                self.write_errors.extend(bulk_error.details.get("writeErrors", []))
+            except Exception as error:
+                self.write_errors.append({"collection": collection, "errmsg": f"{type(error).__name__}: {error}",
+                                          "lost_documents": len(operations)})
+            finally:
+                for _ in documents:
+                    self._queue.task_done()
+        pending.clear()
+
+
+def _encoding_error(document) -> str | None:
+    """
+    Return why the document can't be stored, or None if it can be BSON encoded.
+    One unencodable document would make the whole bulk_write fail, so it is rejected alone before the write.
+    """
+    if not isinstance(document, Mapping):
+        return f"Not a document: {type(document).__name__}"
+    try:
+        encode(document)
+    except (InvalidDocument, TypeError, OverflowError) as error:
+        return f"{type(error).__name__}: {error}"
+    return None
+
+
+def _to_document(record) -> dict:
+    if isinstance(record, Record):
+        return record.to_dict()
+    if is_dataclass(record) and not isinstance(record, type):
+        return asdict(record)
+    return record
+
+
+@atexit.register
+def _close_open_writers() -> None:
+    for writer in list(_open_writers):
+        writer.close()
@@ -0,0 +1,158 @@
+"""
+A megosztott tesztadatok lekérdezéseinek folyamaton belüli gyorsítótára
+"""
+import copy
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from bson import json_util
+from pymongo.collection import Collection
+from pymongo.errors import PyMongoError
+
+
+class QueryCache:
+    """
+    In-process LRU cache of query results with time-to-live, keyed by collection and normalised filter.
+    The writes of mongo_datashare invalidate the entries of their collection. Writes of other processes
+    are seen after the ttl, or immediately if the collection is watched with a change stream.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_in_seconds: float = 60):
+        """
+        Arguments:
+            max_entries: the maximum number of cached queries. Above this the least recently used is evicted.
+            ttl_in_seconds: the maximum age of a cached result.
+        """
+        self.max_entries: int = max_entries
+        self.ttl_in_seconds: float = ttl_in_seconds
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+        self.watch_errors: list[str] = []
+        self._entries: OrderedDict = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._global_generation: int = 0
+        self._lock = threading.Lock()
+        self._watchers: dict[str, threading.Thread] = {}
+        self._stop_watching = threading.Event()
+
+    @staticmethod
+    def create_key(collection: Collection, query_param: dict, query_options: dict) -> tuple[str, str, str]:
+        """
+        Only the top-level keys are sorted: their order doesn't change the result,
+        but the key order of an embedded document does in an exact sub-document match.
+        """
+        return (collection.full_name, json_util.dumps(_sort_top_level_keys(query_param)),
+                json_util.dumps(_sort_top_level_keys(query_options)))
+
+    def get(self, key: tuple[str, str, str]) -> list[dict] | None:
+        """
+        Return a copy of the cached result, or None if it is not cached or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or monotonic() - entry[0] > self.ttl_in_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result: list[dict] = entry[1]
+        return copy.deepcopy(result)
+
+    def generation(self, collection_full_name: str) -> tuple[int, int]:
+        """
+        Return the invalidation generation of the collection. Read it before the fetch and pass it to put().
+        """
+        with self._lock:
+            return self._global_generation, self._generations.get(collection_full_name, 0)
+
+    def put(self, key: tuple[str, str, str], result: list[dict], generation: tuple[int, int] = None) -> None:
+        """
+        Cache the result. If the collection was invalidated since the generation was read,
+        the result may predate a write, so it is not cached.
+
+        Arguments:
+            key: the key created by create_key.
+            result: the result of the query.
+            generation: the return value of generation() read before the query. If None, the result is always cached.
+        """
+        cached_result: list[dict] = copy.deepcopy(result)
+        with self._lock:
+            if generation is not None and generation != (self._global_generation,
+                                                         self._generations.get(key[0], 0)):
+                return
+            self._entries[key] = (monotonic(), cached_result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, collection_full_name: str = None) -> None:
+        """
+        Remove the cached results of a collection. If the collection is not specified, the whole cache is cleared.
+
+        Arguments:
+            collection_full_name: the name of the collection in "database.collection" format.
+        """
+        with self._lock:
+            if collection_full_name is None:
+                self._entries.clear()
+                self._global_generation += 1
+            else:
+                for key in [key for key in self._entries if key[0] == collection_full_name]:
+                    del self._entries[key]
+                self._generations[collection_full_name] = self._generations.get(collection_full_name, 0) + 1
+            self.invalidations += 1
+
+    def metrics(self) -> dict:
+        lookups: int = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "invalidations": self.invalidations, "entries": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups != 0 else 0.0}
+
+    def watch(self, collection: Collection) -> None:
+        """
+        Invalidate the cached results of the collection at every change, using a change stream on a daemon thread.
+        Change streams need a replica set or a sharded cluster. If the stream fails, the error is stored
+        in watch_errors and the cache falls back to the ttl.
+        """
+        with self._lock:
+            if collection.full_name in self._watchers:
+                return
+            self._stop_watching.clear()
+            watcher = threading.Thread(target=self._watch_changes, args=(collection,), daemon=True,
+                                       name=f"lighttest-cache-watch-{collection.full_name}")
+            self._watchers[collection.full_name] = watcher
+        watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        with self._lock:
+            watchers: list[threading.Thread] = list(self._watchers.values())
+            self._watchers.clear()
+        for watcher in watchers:
+            watcher.join()
+
+    def _watch_changes(self, collection: Collection) -> None:
+        try:
+            with collection.watch(max_await_time_ms=500) as change_stream:
+                while not self._stop_watching.is_set():
+                    if change_stream.try_next() is not None:
+                        self.invalidate(collection.full_name)
+        except PyMongoError as watch_error:
+            self.watch_errors.append(f"{collection.full_name}: {watch_error}")
+            with self._lock:
+                self._watchers.pop(collection.full_name, None)
+
+
+query_cache = QueryCache()
+
+
+def _sort_top_level_keys(document):
+    if isinstance(document, dict):
+        return dict(sorted(document.items(), key=lambda item: item[0]))
+    return document
@@ -1,40 +1,195 @@
 """
 A szerver ás adatbáziskapcsoalt létrehozása és konfigurálása
 """
+import asyncio
+import os
+import threading
 
 from pymongo import mongo_client as mc
 
 
-class Mongo:
+def _hashable_option(value):
+    """
+    Return a hashable representation of a client option, for example of the event_listeners list.
+    """
+    try:
+        hash(value)
+    except TypeError:
+        return type(value).__name__, repr(value)
+    return value
+
+
+class _LazyMongoAttributes(type):
+    """
+    The client, the database and the collection are created at first use instead of at import time.
+    """
+
+    @property
+    def client(cls) -> mc.MongoClient:
+        return cls.get_client()
+
+    @property
+    def database(cls):
+        return cls.get_database()
+
+    @property
+    def collection(cls):
+        return cls.get_collection()
+
+
+class Mongo(metaclass=_LazyMongoAttributes):
     dialect_driver: str = "mongodb"
     client_url: str = "localhost:27017"
     default_mongo_client: str = f'mongodb://localhost:27017'
     default_db: str = "default"
-    current_client: str = default_mongo_client
+    default_collection: str = "teszt"
+    current_client: str = os.environ.get("LIGHTTEST_MONGO_URI", default_mongo_client)
     current_database = default_db
+    current_collection: str = default_collection
+    client_options: dict = {}
 
-    client = mc.MongoClient(default_mongo_client)
+    _clients: dict = {}
+    _async_clients: dict = {}
+    _collections: dict = {}
+    _clients_lock = threading.Lock()
+
+    @staticmethod
+    def configure(uri: str = None, max_pool_size: int = None, min_pool_size: int = None,
+                  connect_timeout_ms: int = None, server_selection_timeout_ms: int = None,
+                  socket_timeout_ms: int = None, write_concern: int | str = None, **client_options) -> None:
+        """
+        Set the settings of the mongo clients created after this call.
+        The default uri can also be set with the LIGHTTEST_MONGO_URI environment variable.
+
+        Arguments:
+            uri: the full connection string, for example: mongodb://localhost:27017
+            max_pool_size: the maximum number of connections per server.
+            min_pool_size: the number of connections kept open per server.
+            connect_timeout_ms: the timeout of opening a connection.
+            server_selection_timeout_ms: how long an operation waits for an available server.
+            socket_timeout_ms: the timeout of a send or receive on a socket.
+            write_concern: the 'w' option of the writes, for example: 1, 0 or "majority"
+            client_options: any other keyword argument of pymongo.MongoClient
+        """
+        if uri is not None:
+            Mongo.current_client = uri
+        named_options: dict = {"maxPoolSize": max_pool_size, "minPoolSize": min_pool_size,
+                               "connectTimeoutMS": connect_timeout_ms,
+                               "serverSelectionTimeoutMS": server_selection_timeout_ms,
+                               "socketTimeoutMS": socket_timeout_ms, "w": write_concern}
+        Mongo.client_options.update({key: value for key, value in named_options.items() if value is not None})
+        Mongo.client_options.update(client_options)
+
+    @staticmethod
+    def get_client(uri: str = None) -> mc.MongoClient:
+        """
+        Return the shared client of the uri. The client is created at the first call.
+        If the uri is not specified, the current client's uri is used.
+        """
+        client_key: tuple = Mongo._client_key(uri)
+        client = Mongo._clients.get(client_key)
+        if client is not None:
+            return client
+        with Mongo._clients_lock:
+            if client_key not in Mongo._clients:
+                Mongo._clients[client_key] = mc.MongoClient(client_key[0], **Mongo.client_options)
+            return Mongo._clients[client_key]
+
+    @staticmethod
+    def get_async_client(uri: str = None):
+        """
+        Return the shared motor client of the uri with the same settings as the get_client's.
+        Motor clients are bound to an event loop, so every running loop has its own client.
+        The clients of the closed loops are closed at the next call, for example after every asyncio.run.
+        It has to be called from a coroutine.
+        """
+        from motor.motor_asyncio import AsyncIOMotorClient
 
-    database = client[default_db]
-    collection = database["teszt"]
+        client_key: tuple = Mongo._client_key(uri)
+        async_client_key: tuple = (client_key, asyncio.get_running_loop())
+        with Mongo._clients_lock:
+            for closed_loop_key in [key for key in Mongo._async_clients if key[1].is_closed()]:
+                Mongo._async_clients.pop(closed_loop_key).close()
+            if async_client_key not in Mongo._async_clients:
+                Mongo._async_clients[async_client_key] = AsyncIOMotorClient(client_key[0], **Mongo.client_options)
+            return Mongo._async_clients[async_client_key]
+
+    @staticmethod
+    def get_async_collection(collection_name: str = None, database_name: str = None):
+        collection_name = Mongo.current_collection if collection_name is None else collection_name
+        database_name = Mongo.current_database if database_name is None else database_name
+        return Mongo.get_async_client()[database_name][collection_name]
+
+    @staticmethod
+    def _client_key(uri: str = None) -> tuple:
+        uri = Mongo.current_client if uri is None else uri
+        return uri, tuple(sorted(((name, _hashable_option(value)) for name, value in Mongo.client_options.items()),
+                                 key=lambda option: option[0]))
+
+    @staticmethod
+    def get_database(database_name: str = None):
+        database_name = Mongo.current_database if database_name is None else database_name
+        return Mongo.get_client()[database_name]
+
+    @staticmethod
+    def get_collection(collection_name: str = None, database_name: str = None):
+        """
+        Return the cached collection object. The returned object is thread-safe,
+        it can be shared between threads and doesn't depend on the current collection.
+        """
+        collection_name = Mongo.current_collection if collection_name is None else collection_name
+        database_name = Mongo.current_database if database_name is None else database_name
+        collection_key: tuple = (Mongo._client_key(), database_name, collection_name)
+        collection = Mongo._collections.get(collection_key)
+        if collection is None:
+            collection = Mongo.get_database(database_name)[collection_name]
+            Mongo._collections[collection_key] = collection
+        return collection
+
+    @staticmethod
+    def close(uri: str = None) -> None:
+        """
+        Close the clients of the uri. If the uri is not specified, the current client's clients are closed.
+        """
+        uri = Mongo.current_client if uri is None else uri
+        with Mongo._clients_lock:
+            for client_key in [client_key for client_key in Mongo._clients if client_key[0] == uri]:
+                Mongo._clients.pop(client_key).close()
+            for collection_key in [collection_key for collection_key in Mongo._collections
+                                   if collection_key[0][0] == uri]:
+                del Mongo._collections[collection_key]
+            for async_client_key in [async_client_key for async_client_key in Mongo._async_clients
+                                     if async_client_key[0][0] == uri]:
+                Mongo._async_clients.pop(async_client_key).close()
+
+    @staticmethod
+    def close_all() -> None:
+        with Mongo._clients_lock:
+            for client in Mongo._clients.values():
+                client.close()
+            Mongo._clients.clear()
+            Mongo._collections.clear()
+            for async_client in Mongo._async_clients.values():
+                async_client.close()
+            Mongo._async_clients.clear()
 
     @staticmethod
     def set_client(new_client_url: str) -> None:
         Mongo.client_url = new_client_url
-        Mongo.client = mc.MongoClient(f'{Mongo.dialect_driver}://{Mongo.client_url}')
         Mongo.current_client = f'{Mongo.dialect_driver}://{Mongo.client_url}'
 
     @staticmethod
     def set_dialect_driver(new_dialect_driver: str) -> None:
         Mongo.dialect_driver = new_dialect_driver
         Mongo.set_client(Mongo.client_url)
-        Mongo.current_client = f'{Mongo.dialect_driver}://{Mongo.client_url}'
 
     @staticmethod
     def set_database(database_name: str):
-        Mongo.database = Mongo.client[database_name]
         Mongo.current_database = database_name
 
     @staticmethod
     def set_collection(collection_name: str):
-        Mongo.collection = Mongo.database[collection_name]
+        """
+        Set the default collection. It is used only where no collection is specified.
+        """
+        Mongo.current_collection = collection_name
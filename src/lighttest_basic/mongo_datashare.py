@@ -2,40 +2,282 @@
 A mongoDB-vel kapcsoaltos tranzakciók, mint a lekérdezések és az insertálások
 """
 import json
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
 
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+from pymongo.cursor import Cursor
+
+from lighttest_basic.mongo_cache import query_cache
 from lighttest_basic.mongo_connection import Mongo as con
+from lighttest_basic.mongo_indexes import SlowQueryCheck
+
+
+class CollectionHandle:
+    """
+    A handle of a collection. It doesn't depend on the current collection of the Mongo class,
+    so handles of different collections can be used in parallel from threads and asyncio tasks.
+
+    Example:
+        users = collection_handle("users")
+        users.insert_one({"name": "John Doe"})
+        admins = users.query({"role": "admin"})
+    """
+
+    def __init__(self, collection_name: str, database_name: str = None):
+        self.collection_name: str = collection_name
+        self.database_name: str = database_name
+
+    @property
+    def collection(self) -> Collection:
+        return con.get_collection(self.collection_name, self.database_name)
+
+    def query(self, query_param: json, **query_options) -> list[dict]:
+        return query(query_param, self, **query_options)
+
+    def query_iter(self, query_param: json, **query_options) -> Cursor:
+        return query_iter(query_param, self, **query_options)
+
+    def insert_one(self, record: json) -> None:
+        insert_one(record, self)
+
+    def insert_many(self, records: [json]) -> None:
+        insert_many(records, self)
+
+    def delete_one(self, records: [json]) -> None:
+        delete_one(records, self)
+
+    def delete_many(self, records: [json]) -> None:
+        delete_many(records, self)
 
+    def claim(self, query_param: json, **lease_options) -> list[dict]:
+        return claim(query_param, collection=self, **lease_options)
 
-def query(query_param: json, collection="") -> list[dict]:
+    def release(self, records: list, worker_id: str = None) -> int:
+        return release(records, collection=self, worker_id=worker_id)
+
+
+_collection_handles: dict[tuple[str, str], CollectionHandle] = {}
+_collection_handles_lock = threading.Lock()
+
+
+def collection_handle(collection_name: str, database_name: str = None) -> CollectionHandle:
+    """
+    Return the cached handle of the collection.
+    If the database is not specified, the current database is used at every operation.
+    """
+    handle_key: tuple[str, str] = (database_name, collection_name)
+    with _collection_handles_lock:
+        if handle_key not in _collection_handles:
+            _collection_handles[handle_key] = CollectionHandle(collection_name, database_name)
+        return _collection_handles[handle_key]
+
+
+def _get_collection(collection: str | CollectionHandle | Collection) -> Collection:
+    """
+    Return the collection object of a collection name, handle or object.
+    If the collection is an empty string, the default collection is used.
+    """
+    if isinstance(collection, CollectionHandle):
+        return collection.collection
+    if isinstance(collection, Collection):
+        return collection
+    if collection == "":
+        return con.get_collection()
+    return con.get_collection(collection)
+
+
+def query(query_param: json, collection: str | CollectionHandle = "", cached: bool = False,
+          **query_options) -> list[dict]:
     """Create a query in the specified collection. If you didn't specified the collection,
-        it will run the query on the lastly specified collection"""
-    if collection != "":
-        con.set_collection(collection)
+        it will run the query on the default collection (see Mongo.set_collection).
+        The query_options are the same as the query_iter's.
+        If cached is true, the result is read through the query_cache of the mongo_cache module.
+        If the SlowQueryCheck is enabled, the slow queries are explained and reported."""
+    cache_key: tuple = None
+    cache_generation: tuple[int, int] = None
+    if cached:
+        cache_key = query_cache.create_key(_get_collection(collection), query_param, query_options)
+        cached_result: list[dict] = query_cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+        cache_generation = query_cache.generation(cache_key[0])
 
-    result = con.collection.find(query_param)
-    result_list: list[dict] = [record for record in result]
+    start_time: float = perf_counter()
+    result_list: list[dict] = list(query_iter(query_param, collection, **query_options))
+    if SlowQueryCheck.enabled:
+        SlowQueryCheck.check(collection=_get_collection(collection), query_param=query_param,
+                             required_time=perf_counter() - start_time, query_options=query_options)
+    if cached:
+        query_cache.put(cache_key, result_list, generation=cache_generation)
     return result_list
 
 
-def insert_one(record: json, collection="") -> None:
-    if collection != "":
-        con.set_collection(collection)
-    con.collection.insert_one(record)
+def query_iter(query_param: json, collection: str | CollectionHandle = "", projection: dict | list = None,
+               batch_size: int = 0, limit: int = 0, skip: int = 0, sort: list[tuple] = None,
+               hint: str | list[tuple] = None) -> Cursor:
+    """
+    Create a lazy query in the specified collection. The documents are fetched batch by batch during the iteration,
+    so the memory usage doesn't depend on the size of the result.
+
+    Arguments:
+        query_param: the filter of the query.
+        collection: the name or the handle of the collection. If empty, the default collection is used.
+        projection: the returned fields, for example: {"name": 1, "_id": 0}
+        batch_size: the number of documents in one round-trip. 0 means the server's default.
+        limit: the maximum number of returned documents. 0 means no limit.
+        skip: the number of skipped documents.
+        sort: list of (field name, direction) pairs, for example: [("created", -1)]
+        hint: the index to use, given by name or by its key pattern.
+
+    Example:
+        for user in query_iter({"role": "admin"}, collection="users", projection={"token": 1}, limit=5):
+            ...
+    """
+    return _get_collection(collection).find(query_param, projection=projection, batch_size=batch_size, limit=limit,
+                                            skip=skip, sort=sort, hint=hint)
+
+
+async def query_aiter(query_param: json, collection: str | CollectionHandle = "", **query_options):
+    """
+    Async iterator variant of the query_iter. It is the same as the mongo_datashare_async.query_iter,
+    which fetches the batches with motor, so the event loop is free while the next batch is fetched.
+
+    Example:
+        async for user in query_aiter({"role": "admin"}, collection="users", limit=5):
+            ...
+    """
+    from lighttest_basic.mongo_datashare_async import query_iter as motor_query_iter
+
+    async for record in motor_query_iter(query_param, collection, **query_options):
+        yield record
+
+
+def insert_one(record: json, collection: str | CollectionHandle = "") -> None:
+    target_collection: Collection = _get_collection(collection)
+    target_collection.insert_one(record)
+    query_cache.invalidate(target_collection.full_name)
+
+
+def insert_many(records: [json], collection: str | CollectionHandle = "") -> None:
+    target_collection: Collection = _get_collection(collection)
+    target_collection.insert_many(records)
+    query_cache.invalidate(target_collection.full_name)
+
+
+def delete_one(records: [json], collection: str | CollectionHandle = "") -> None:
+    target_collection: Collection = _get_collection(collection)
+    target_collection.delete_one(records)
+    query_cache.invalidate(target_collection.full_name)
+
+
+def delete_many(records: [json], collection: str | CollectionHandle = "") -> None:
+    target_collection: Collection = _get_collection(collection)
+    target_collection.delete_many(records)
+    query_cache.invalidate(target_collection.full_name)
+
+
+LEASE_FIELD: str = "_lease"
+
+
+def default_worker_id() -> str:
+    """
+    Return an id which is unique for the current host and process. The thread is not part of the id,
+    so a lease claimed on one thread can be released or renewed on another thread of the same worker.
+    Pass an explicit worker_id if the threads of a process have to own their leases separately.
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def claim(query_param: json, collection: str | CollectionHandle = "", count: int = 1, worker_id: str = None,
+          lease_in_seconds: float = 300) -> list[dict]:
+    """
+    Atomically lease documents to a worker, so parallel workers never get the same test data.
+    Only documents without a lease or with an expired lease can be claimed.
+    The lease is stored in the _lease field of the document: {"owner": worker_id, "expires_at": datetime}
+
+    Arguments:
+        query_param: the filter of the claimable documents.
+        collection: the name or the handle of the collection. If empty, the default collection is used.
+        count: the maximum number of claimed documents.
+        worker_id: the owner of the lease. If None, the default_worker_id() is used.
+        lease_in_seconds: the lease expires after this time, then other workers can claim the document.
+
+    Return:
+        the claimed documents. It can be less than count, if there are not enough free documents.
+
+    Example:
+        accounts = claim({"role": "admin"}, collection="accounts", count=2)
+        ...
+        release(accounts, collection="accounts")
+    """
+    target_collection: Collection = _get_collection(collection)
+    worker_id = default_worker_id() if worker_id is None else worker_id
+    now: datetime = datetime.now(timezone.utc)
+    claimable_query: dict = {"$and": [query_param, {"$or": [{LEASE_FIELD: None},
+                                                            {f"{LEASE_FIELD}.expires_at": {"$lte": now}}]}]}
+    lease: dict = {"owner": worker_id, "expires_at": now + timedelta(seconds=lease_in_seconds)}
+    claimed_records: list[dict] = []
+    for _ in range(count):
+        claimed_record: dict = target_collection.find_one_and_update(
+            claimable_query, {"$set": {LEASE_FIELD: lease}}, return_document=ReturnDocument.AFTER)
+        if claimed_record is None:
+            break
+        claimed_records.append(claimed_record)
+    if len(claimed_records) != 0:
+        query_cache.invalidate(target_collection.full_name)
+    return claimed_records
+
+
+def renew_lease(records: list, collection: str | CollectionHandle = "", worker_id: str = None,
+                lease_in_seconds: float = 300) -> int:
+    """
+    Extend the leases of the worker on the given documents or document ids.
+
+    Return:
+        the number of renewed leases.
+    """
+    target_collection: Collection = _get_collection(collection)
+    worker_id = default_worker_id() if worker_id is None else worker_id
+    expires_at: datetime = datetime.now(timezone.utc) + timedelta(seconds=lease_in_seconds)
+    renewed = target_collection.update_many({"_id": {"$in": _record_ids(records)}, f"{LEASE_FIELD}.owner": worker_id},
+                                            {"$set": {f"{LEASE_FIELD}.expires_at": expires_at}})
+    query_cache.invalidate(target_collection.full_name)
+    return renewed.modified_count
+
+
+def release(records: list, collection: str | CollectionHandle = "", worker_id: str = None) -> int:
+    """
+    Release the leases of the worker on the given documents or document ids.
 
+    Return:
+        the number of released documents.
+    """
+    target_collection: Collection = _get_collection(collection)
+    worker_id = default_worker_id() if worker_id is None else worker_id
+    released = target_collection.update_many({"_id": {"$in": _record_ids(records)}, f"{LEASE_FIELD}.owner": worker_id},
+                                             {"$unset": {LEASE_FIELD: ""}})
+    query_cache.invalidate(target_collection.full_name)
+    return released.modified_count
 
-def insert_many(records: [json], collection="") -> None:
-    if collection != "":
-        con.set_collection(collection)
-    con.collection.insert_many(records)
 
+def reap_expired_leases(collection: str | CollectionHandle = "") -> int:
+    """
+    Remove the expired leases, for example the leases of crashed workers.
 
-def delete_one(records: [json], collection="") -> None:
-    if collection != "":
-        con.set_collection(collection)
-    con.collection.delete_one(records)
+    Return:
+        the number of reaped leases.
+    """
+    target_collection: Collection = _get_collection(collection)
+    reaped = target_collection.update_many({f"{LEASE_FIELD}.expires_at": {"$lte": datetime.now(timezone.utc)}},
+                                           {"$unset": {LEASE_FIELD: ""}})
+    query_cache.invalidate(target_collection.full_name)
+    return reaped.modified_count
 
 
-def delete_many(records: [json], collection="") -> None:
-    if collection != "":
-        con.set_collection(collection)
-    con.collection.delete_many(records)
+def _record_ids(records: list) -> list:
+    return [record["_id"] if isinstance(record, dict) else record for record in records]
@@ -0,0 +1,70 @@
+"""
+A mongo_datashare lekérdezései és insertálásai coroutine-ként, motor alapon
+"""
+import json
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from lighttest_basic.mongo_cache import query_cache
+from lighttest_basic.mongo_connection import Mongo as con
+from lighttest_basic.mongo_datashare import CollectionHandle
+
+
+def _get_collection(collection: str | CollectionHandle) -> AsyncIOMotorCollection:
+    """
+    Return the motor collection of a collection name or handle.
+    If the collection is an empty string, the default collection is used.
+    """
+    if isinstance(collection, CollectionHandle):
+        return con.get_async_collection(collection.collection_name, collection.database_name)
+    if collection == "":
+        return con.get_async_collection()
+    return con.get_async_collection(collection)
+
+
+async def query(query_param: json, collection: str | CollectionHandle = "", **query_options) -> list[dict]:
+    """
+    Create a query in the specified collection. If you didn't specified the collection,
+    it will run the query on the default collection. The query_options are the same as the query_iter's.
+
+    Example:
+        users, response = await asyncio.gather(query({"role": "admin"}, collection="users"),
+                                               get_req_task(uri_path="/users", session=session, request={}))
+    """
+    return [record async for record in query_iter(query_param, collection, **query_options)]
+
+
+async def query_iter(query_param: json, collection: str | CollectionHandle = "", projection: dict | list = None,
+                     batch_size: int = 0, limit: int = 0, skip: int = 0, sort: list[tuple] = None,
+                     hint: str | list[tuple] = None):
+    """
+    Async iterator of a lazy query. The arguments are the same as the mongo_datashare.query_iter's.
+    """
+    cursor = _get_collection(collection).find(query_param, projection=projection, batch_size=batch_size,
+                                              limit=limit, skip=skip, sort=sort, hint=hint)
+    async for record in cursor:
+        yield record
+
+
+async def insert_one(record: json, collection: str | CollectionHandle = "") -> None:
+    target_collection: AsyncIOMotorCollection = _get_collection(collection)
+    await target_collection.insert_one(record)
+    query_cache.invalidate(target_collection.full_name)
+
+
+async def insert_many(records: [json], collection: str | CollectionHandle = "") -> None:
+    target_collection: AsyncIOMotorCollection = _get_collection(collection)
+    await target_collection.insert_many(records)
+    query_cache.invalidate(target_collection.full_name)
+
+
+async def delete_one(records: [json], collection: str | CollectionHandle = "") -> None:
+    target_collection: AsyncIOMotorCollection = _get_collection(collection)
+    await target_collection.delete_one(records)
+    query_cache.invalidate(target_collection.full_name)
+
+
+async def delete_many(records: [json], collection: str | CollectionHandle = "") -> None:
+    target_collection: AsyncIOMotorCollection = _get_collection(collection)
+    await target_collection.delete_many(records)
+    query_cache.invalidate(target_collection.full_name)
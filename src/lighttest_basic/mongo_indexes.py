@@ -0,0 +1,120 @@
+"""
+A tesztadat-megosztó kollekciók indexeinek kezelése és a lassú lekérdezések vizsgálata
+"""
+import threading
+import warnings
+
+from pymongo import IndexModel
+from pymongo.collection import Collection
+
+from lighttest_basic.datacollections import SlowQueryReport
+from lighttest_basic.mongo_connection import Mongo as con
+
+
+class IndexRegistry:
+    """
+    Declarative registry of the indexes of the test-data collections.
+
+    Example:
+        IndexRegistry.register("users", [("role", 1), ("locked", 1)])
+        IndexRegistry.register("tokens", [("user_id", 1)], unique=True)
+        IndexRegistry.ensure_indexes()
+    """
+    _indexes: dict[tuple[str, str], list[IndexModel]] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def register(collection_name: str, keys: str | list[tuple], database_name: str = None,
+                 **index_options) -> None:
+        """
+        Register an index of a collection.
+
+        Arguments:
+            collection_name: the name of the collection.
+            keys: a field name or a list of (field name, direction) pairs, for example: [("role", 1)]
+            database_name: the name of the database. If None, the current database is used.
+            index_options: any option of pymongo.IndexModel, for example: unique, name, expireAfterSeconds
+        """
+        with IndexRegistry._lock:
+            IndexRegistry._indexes.setdefault((database_name, collection_name), []).append(
+                IndexModel(keys, **index_options))
+
+    @staticmethod
+    def ensure_indexes(collection_name: str = None) -> dict[str, list[str]]:
+        """
+        Create the registered indexes. Already existing indexes are not rebuilt, so it can be called at every startup.
+
+        Arguments:
+            collection_name: if specified, only the indexes of this collection are created.
+
+        Return:
+            the names of the ensured indexes by collection.
+        """
+        ensured_indexes: dict[str, list[str]] = {}
+        with IndexRegistry._lock:
+            registered_indexes: list = list(IndexRegistry._indexes.items())
+        for (database_name, registered_collection), index_models in registered_indexes:
+            if collection_name is not None and registered_collection != collection_name:
+                continue
+            collection: Collection = con.get_collection(registered_collection, database_name)
+            ensured_indexes[collection.full_name] = collection.create_indexes(index_models)
+        return ensured_indexes
+
+
+class SlowQueryCheck:
+    """
+    Opt-in check of the slow queries of the mongo_datashare.
+    If a query takes more time than the threshold, its query plan is explained and reported.
+    A warning is raised when the winning plan is a collection scan.
+    """
+    enabled: bool = False
+    threshold_in_seconds: float = 0.01
+    reports: list[SlowQueryReport] = []
+
+    @staticmethod
+    def enable(threshold_in_seconds: float = 0.01) -> None:
+        SlowQueryCheck.enabled = True
+        SlowQueryCheck.threshold_in_seconds = threshold_in_seconds
+
+    @staticmethod
+    def disable() -> None:
+        SlowQueryCheck.enabled = False
+
+    @staticmethod
+    def check(collection: Collection, query_param: dict, required_time: float,
+              query_options: dict = None) -> SlowQueryReport | None:
+        """
+        Explain the query if it was slower than the threshold.
+        The query_options are the options of the checked query, for example sort, hint, projection and limit,
+        so the explained plan is the plan of the same query.
+
+        Return:
+            the report of the slow query, or None if the check is disabled or the query was fast.
+        """
+        if not SlowQueryCheck.enabled or required_time < SlowQueryCheck.threshold_in_seconds:
+            return None
+        explained_cursor = collection.find(query_param, **(query_options or {}))
+        winning_plan: dict = explained_cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        plan_stages: list[str] = _collect_plan_stages(winning_plan)
+        report = SlowQueryReport(collection=collection.full_name, query=query_param, required_time=required_time,
+                                 plan_stages=plan_stages, collection_scan="COLLSCAN" in plan_stages)
+        SlowQueryCheck.reports.append(report)
+        if report.collection_scan:
+            warnings.warn(f"Collection scan in {report.collection} for query {query_param} "
+                          f"({round(required_time * 1000, 1)} ms), register an index for it")
+        return report
+
+
+def _collect_plan_stages(plan: dict) -> list[str]:
+    """
+    Return the stages of a query plan from the top to the bottom.
+    """
+    stages: list[str] = []
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_collect_plan_stages(plan[key]))
+    for input_stage in plan.get("inputStages", []):
+        stages.extend(_collect_plan_stages(input_stage))
+    return stages
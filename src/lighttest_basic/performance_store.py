@@ -0,0 +1,210 @@
+"""
+A performancia-eredmények oszlopos, csak hozzáfűzhető tárolója a buildek közötti trendelemzéshez
+"""
+import atexit
+import os
+import threading
+import time
+import uuid
+import weakref
+from pathlib import Path
+
+import numpy as np
+
+from lighttest_basic.datacollections import BackendPerformanceStatisticPost, UniversalPerformancePost
+
+_UNIVERSAL_RECORD: str = "universal"
+_BACKEND_RECORD: str = "backend"
+_open_stores: weakref.WeakSet = weakref.WeakSet()
+
+
+class PerformanceStore:
+    """
+    Append-only columnar storage of UniversalPerformancePost and BackendPerformanceStatisticPost records.
+    The records are buffered and written in segments, every column of a segment is a numpy file,
+    which is memory-mapped at reading. No database is needed. Every open store is flushed at exit.
+
+    Directory structure:
+        directory/segment_<run id>_<process id>_<sequence>_<store id>/<column>.npy
+
+    Example:
+        store = PerformanceStore("performance_history", run_id=build_number)
+        store.append(universal_performance_post)
+        store.flush()
+        store.percentile(95, testcase_name="login", last_runs=10)
+
+        with PerformanceStore("performance_history") as store:
+            store.append_many(performance_posts)
+    """
+
+    def __init__(self, directory: str, run_id: int = None, batch_size: int = 1000):
+        """
+        Arguments:
+            directory: the directory of the segment files.
+            run_id: the id of the current run, for example the build number. Default: the current time in ms.
+            batch_size: the number of buffered records that are written into one segment.
+        """
+        self.directory = Path(directory)
+        self.run_id: int = int(time.time() * 1000) if run_id is None else run_id
+        self.batch_size: int = batch_size
+        self._buffer: list[tuple] = []
+        self._segment_count: int = 0
+        self._store_id: str = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        _open_stores.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    def append(self, record: UniversalPerformancePost | BackendPerformanceStatisticPost) -> None:
+        match record:
+            case UniversalPerformancePost():
+                row = (_UNIVERSAL_RECORD, record.testcase_name, _plain(record.test_type), _plain(record.result),
+                       record.required_time)
+            case BackendPerformanceStatisticPost():
+                row = (_BACKEND_RECORD, record.request_url, "", _plain(record.result), record.response_time)
+            case _:
+                raise TypeError(f"Unsupported record type: '{type(record).__name__}'")
+        with self._lock:
+            self._buffer.append(row)
+            buffer_is_full: bool = len(self._buffer) >= self.batch_size
+        if buffer_is_full:
+            self.flush()
+
+    def append_many(self, records) -> None:
+        for record in records:
+            self.append(record)
+
+    def flush(self) -> None:
+        """
+        Write the buffered records into a new segment.
+        """
+        with self._lock:
+            if len(self._buffer) == 0:
+                return
+            rows: list[tuple] = self._buffer
+            self._buffer = []
+            self._segment_count += 1
+            segment_name: str = f"segment_{self.run_id}_{os.getpid()}_{self._segment_count:06d}_{self._store_id}"
+
+        record_types, names, test_types, results, durations = zip(*rows)
+        columns: dict[str, np.ndarray] = {
+            "run_id": np.full(len(rows), self.run_id, dtype=np.int64),
+            "record_type": np.array(record_types, dtype=str),
+            "name": np.array(names, dtype=str),
+            "test_type": np.array(test_types, dtype=str),
+            "result": np.array(results, dtype=str),
+            "duration": np.array(durations, dtype=np.float64)}
+
+        temporary_directory: Path = self.directory / f".{segment_name}.tmp"
+        temporary_directory.mkdir(parents=True, exist_ok=True)
+        for column_name, column in columns.items():
+            np.save(temporary_directory / f"{column_name}.npy", column)
+        temporary_directory.rename(self.directory / segment_name)
+
+    def runs(self) -> list[int]:
+        """
+        Return the stored run ids in ascending order.
+        """
+        return sorted({run_id for run_id, _ in self._segments()})
+
+    def durations(self, testcase_name: str = None, request_url: str = None, last_runs: int = None,
+                  result: str = None) -> np.ndarray:
+        """
+        Return the stored durations that match every given filter.
+
+        Arguments:
+            testcase_name: filter for the testcase_name of the UniversalPerformancePost records.
+            request_url: filter for the request_url of the BackendPerformanceStatisticPost records.
+            last_runs: only the last N runs are used.
+            result: filter for the result, for example: "successful"
+        """
+        segments: list[tuple[int, Path]] = self._segments()
+        if last_runs is not None:
+            selected_runs: set[int] = set(sorted({run_id for run_id, _ in segments})[-last_runs:])
+            segments = [segment for segment in segments if segment[0] in selected_runs]
+
+        return _concatenate([_segment_durations(segment_directory, testcase_name=testcase_name,
+                                                request_url=request_url, result=result)
+                             for _, segment_directory in segments])
+
+    def percentile(self, percentile: float, testcase_name: str = None, request_url: str = None,
+                   last_runs: int = None, result: str = None) -> float | None:
+        """
+        Return the percentile of the matching durations, or None if there is no matching record.
+        The filters are the same as the durations method's.
+
+        Example:
+            store.percentile(95, request_url="/api/users", last_runs=20)
+        """
+        selected_durations: np.ndarray = self.durations(testcase_name=testcase_name, request_url=request_url,
+                                                        last_runs=last_runs, result=result)
+        if len(selected_durations) == 0:
+            return None
+        return float(np.percentile(selected_durations, percentile))
+
+    def percentiles_by_run(self, percentile: float, testcase_name: str = None, request_url: str = None,
+                           last_runs: int = None, result: str = None) -> dict[int, float]:
+        """
+        Return the percentile of every run separately, to detect latency regressions between builds.
+        The filters are the same as the durations method's.
+        """
+        run_ids: list[int] = self.runs()
+        if last_runs is not None:
+            run_ids = run_ids[-last_runs:]
+        segments: list[tuple[int, Path]] = self._segments()
+        run_percentiles: dict[int, float] = {}
+        for run_id in run_ids:
+            run_durations: np.ndarray = _concatenate(
+                [_segment_durations(segment_directory, testcase_name=testcase_name, request_url=request_url,
+                                    result=result)
+                 for segment_run_id, segment_directory in segments if segment_run_id == run_id])
+            if len(run_durations) != 0:
+                run_percentiles[run_id] = float(np.percentile(run_durations, percentile))
+        return run_percentiles
+
+    def _segments(self) -> list[tuple[int, Path]]:
+        if not self.directory.exists():
+            return []
+        segments: list[tuple[int, Path]] = []
+        for segment_directory in self.directory.iterdir():
+            if segment_directory.is_dir() and segment_directory.name.startswith("segment_"):
+                segments.append((int(segment_directory.name.split("_")[1]), segment_directory))
+        return sorted(segments)
+
+
+def _segment_durations(segment_directory: Path, testcase_name: str = None, request_url: str = None,
+                       result: str = None) -> np.ndarray:
+    """
+    Filter the memory-mapped columns of a segment and return the matching durations.
+    """
+    duration: np.ndarray = np.load(segment_directory / "duration.npy", mmap_mode="r")
+    mask: np.ndarray = np.ones(len(duration), dtype=bool)
+    filters: list[tuple[str, str]] = [("result", result)]
+    if testcase_name is not None:
+        filters.extend([("record_type", _UNIVERSAL_RECORD), ("name", testcase_name)])
+    if request_url is not None:
+        filters.extend([("record_type", _BACKEND_RECORD), ("name", request_url)])
+    for column_name, expected_value in filters:
+        if expected_value is not None:
+            mask &= np.load(segment_directory / f"{column_name}.npy", mmap_mode="r") == expected_value
+    return np.asarray(duration[mask])
+
+
+def _concatenate(durations: list[np.ndarray]) -> np.ndarray:
+    if len(durations) == 0:
+        return np.empty(0, dtype=np.float64)
+    return np.concatenate(durations)
+
+
+def _plain(value) -> str:
+    return str(getattr(value, "value", value))
+
+
+@atexit.register
+def _flush_open_stores() -> None:
+    for store in list(_open_stores):
+        store.flush()
@@ -0,0 +1,164 @@
+"""
+A hibás tesztlépésekről készült képernyőképek háttérszálon futó tömörítése és mentése
+"""
+import atexit
+import hashlib
+import io
+import os
+import queue
+import threading
+import warnings
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+
+from lighttest_supplies.general import create_logging_structure, create_logging_directory
+
+_FLUSH = object()
+_STOP = object()
+_IMAGE_FORMATS: dict[str, str] = {"png": "PNG", "webp": "WEBP", "jpeg": "JPEG"}
+
+
+def default_screenshots_directory() -> str:
+    """
+    Return the LIGHTTEST_SCREENSHOTS_DIR environment variable, or the lighttest_screenshots directory
+    in the user's home directory.
+    """
+    return os.environ.get("LIGHTTEST_SCREENSHOTS_DIR", str(Path.home() / "lighttest_screenshots"))
+
+
+class ScreenshotWriter:
+    """
+    Encode and save the screenshots on a worker thread, so the test thread only captures the png bytes.
+    The identical frames are saved only once. Every writer is flushed at exit.
+    The webp and jpeg formats and the downscaling need the Pillow package, without it the png is saved.
+
+    Example:
+        writer = ScreenshotWriter(image_format="webp", max_width=1280)
+        writer.submit(driver.get_screenshot_as_png(), "/tmp/screenshots", "example_com", "2024-01-01_12-00-00")
+        writer.flush()
+    """
+
+    def __init__(self, image_format: str = "png", quality: int = 80, max_width: int = None,
+                 max_queue_size: int = 100, remembered_frames: int = 256):
+        """
+        Arguments:
+            image_format: "png", "webp" or "jpeg"
+            quality: the quality of the webp and jpeg images, between 1 and 100.
+            max_width: the wider screenshots are downscaled to this width. If None, the size is kept.
+            max_queue_size: the maximum number of waiting screenshots. Above this the submit() blocks.
+            remembered_frames: the number of recent frame hashes used for the deduplication.
+        """
+        if image_format not in _IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: '{image_format}'")
+        self.image_format: str = image_format
+        self.quality: int = quality
+        self.max_width: int = max_width
+        self.remembered_frames: int = remembered_frames
+        self.written_paths: list[Path] = []
+        self.duplicate_count: int = 0
+        self.write_errors: list[str] = []
+        self._frames: OrderedDict[str, Path] = OrderedDict()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._closed: bool = False
+        self._worker = threading.Thread(target=self._run, name="lighttest-screenshot-writer", daemon=True)
+        self._worker.start()
+        _open_writers.add(self)
+
+    def submit(self, png_bytes: bytes, directory: str, project_name: str, file_name: str) -> None:
+        """
+        Queue a screenshot. It is saved into the directory/project_name/date/hour directory structure,
+        the extension of the file_name is added by the writer.
+        """
+        if self._closed:
+            raise RuntimeError("The screenshot writer is closed")
+        self._queue.put((png_bytes, directory, project_name, file_name))
+
+    def flush(self) -> None:
+        """
+        Wait till every queued screenshot is saved.
+        """
+        if self._closed:
+            return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._worker.join()
+        _open_writers.discard(self)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if item is not _FLUSH:
+                    self._save(*item)
+            except Exception as error:
+                self.write_errors.append(f"{type(error).__name__}: {error}")
+            finally:
+                self._queue.task_done()
+
+    def _save(self, png_bytes: bytes, directory: str, project_name: str, file_name: str) -> None:
+        frame_hash: str = hashlib.blake2b(png_bytes, digest_size=16).hexdigest()
+        if frame_hash in self._frames:
+            self._frames.move_to_end(frame_hash)
+            self.duplicate_count += 1
+            return
+
+        image_bytes, extension = self._encode(png_bytes)
+        create_logging_directory(directory, project_name)
+        screenshot_path: Path = Path(create_logging_structure(directory, project_name).absolute(),
+                                     f"{file_name}.{extension}")
+        screenshot_path.write_bytes(image_bytes)
+        self.written_paths.append(screenshot_path)
+
+        self._frames[frame_hash] = screenshot_path
+        if len(self._frames) > self.remembered_frames:
+            self._frames.popitem(last=False)
+
+    def _encode(self, png_bytes: bytes) -> tuple[bytes, str]:
+        if self.image_format == "png" and self.max_width is None:
+            return png_bytes, "png"
+        try:
+            from PIL import Image
+        except ImportError:
+            warnings.warn("The Pillow package is not installed, the screenshots are saved as png", stacklevel=2)
+            self.image_format, self.max_width = "png", None
+            return png_bytes, "png"
+
+        with Image.open(io.BytesIO(png_bytes)) as image:
+            if self.max_width is not None and image.width > self.max_width:
+                image = image.resize((self.max_width, round(image.height * self.max_width / image.width)))
+            if self.image_format == "jpeg":
+                image = image.convert("RGB")
+            encoded_image = io.BytesIO()
+            image.save(encoded_image, format=_IMAGE_FORMATS[self.image_format], quality=self.quality)
+        return encoded_image.getvalue(), self.image_format
+
+
+_open_writers: weakref.WeakSet = weakref.WeakSet()
+_default_writer: ScreenshotWriter = None
+_default_writer_lock = threading.Lock()
+
+
+def default_screenshot_writer() -> ScreenshotWriter:
+    """
+    Return the shared png writer of the MiUsIn objects. It is started at the first screenshot.
+    """
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None or _default_writer._closed:
+            _default_writer = ScreenshotWriter()
+        return _default_writer
+
+
+@atexit.register
+def _close_open_writers() -> None:
+    for writer in list(_open_writers):
+        writer.close()
@@ -6,10 +6,26 @@ from lighttest_supplies.general_datas import TestType as tt
 from lighttest_supplies.timers import Utimer
 from sqlalchemy.exc import ProgrammingError, TimeoutError, DatabaseError
 from functools import wraps
+from pathlib import Path
+import hashlib
 import inspect
-from decimal import Decimal
+import json
+import os
+import random
+import threading
+from contextlib import contextmanager
+from dataclasses import replace
+from collections.abc import Iterator, Mapping
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, DecimalException, Inexact
+from uuid import UUID
 
-from lighttest_basic.datacollections import QueryResult, QueryErrorPost, TestTypes, ResultTypes, QueryAssertionResult
+import bson
+from bson import Binary, Decimal128, json_util
+from bson.decimal128 import create_decimal128_context
+
+from lighttest_basic.datacollections import QueryResult, QueryErrorPost, TestTypes, ResultTypes, QueryAssertionResult, \
+    ResultSample, SamplingMethods
 
 
 # decorator
@@ -27,7 +43,7 @@ def execute_query(sql_query):
         error: str = ""
         measure_performance.set_start()
         try:
-            con = connection_object.cursor
+            con = connection_object.get_active_cursor()
 
         except (ProgrammingError, TimeoutError, DatabaseError) as sql_error:
             error = sql_error
@@ -52,11 +68,12 @@ def assertion(assertion_fun):
     def assertion_method(*args, show_actual_result: bool = True, show_expected_result: bool = True,
                          performance_limit_in_seconds: float = 1,
                          attributes: dict = dict(), positivity: str = tt.POSITIVE.value, critical_step: bool = False,
-                         **kwargs) -> QueryAssertionResult | None:
-        actual_result: list[dict] = []
-        expected_result: list[dict] = []
+                         result_sample_size: int = None, sampling_method: str = SamplingMethods.FIRST.value,
+                         use_fingerprint: bool = False, **kwargs) -> QueryAssertionResult | None:
+        actual_result: Iterator[dict] = iter(())
+        expected_result: Iterator[dict] = iter(())
 
-        completed_kwargs: dict = signature.arguments
+        completed_kwargs: dict = dict(signature.arguments)
         completed_kwargs.update(kwargs)
 
         if not contains_query_result(list(completed_kwargs.values()) + list(args)):
@@ -66,17 +83,43 @@ def assertion(assertion_fun):
         acceptable_performance: bool = performance_check(sql_result=completed_kwargs["result_informations"],
                                                          timelimit_in_seconds=performance_limit_in_seconds)
 
+        sql_connection: SqlConnection = args[0]
+        fingerprint_key: str = f'{completed_kwargs["result_informations"].alias}:{assertion_fun.__name__}'
+        fingerprint_record: dict = {}
+        fingerprint_enabled: bool = use_fingerprint and sql_connection.fingerprint_store is not None \
+            and "result_informations" in kwargs
+        if fingerprint_enabled:
+            fingerprint_record = _fingerprint_assertion_inputs(
+                sql_connection=sql_connection, kwargs=kwargs, stored_record=sql_connection.fingerprint_store.get(
+                    fingerprint_key), assertion_arguments=_fingerprinted_arguments(assertion_fun, args, kwargs))
+            if fingerprint_record.get("fingerprint_match", False):
+                return QueryAssertionResult(errors=[], not_found_rows=[], query_result=[],
+                                            fingerprint=fingerprint_record["fingerprint"], fingerprint_match=True)
+
+        if result_sample_size is not None and "result_sampler" in completed_kwargs:
+            kwargs["result_sampler"] = ResultSampler(sample_size=result_sample_size, sampling_method=sampling_method)
+
         assertion_result: QueryAssertionResult = assertion_fun(*args, **kwargs)
+        if fingerprint_enabled:
+            fingerprint_record = _complete_fingerprint_record(fingerprint_record, kwargs)
+            assertion_result.fingerprint = fingerprint_record["fingerprint"]
+        if result_sample_size is not None and assertion_result.result_sample is None:
+            result_sampler = ResultSampler(sample_size=result_sample_size, sampling_method=sampling_method)
+            result_sampler.update(assertion_result.query_result)
+            assertion_result.result_sample = result_sampler.summary()
+            assertion_result.query_result = assertion_result.result_sample.rows
+
         errors = _ensure_mongodb_compatible(*assertion_result.errors)
         not_found_rows = _ensure_mongodb_compatible(*assertion_result.not_found_rows)
-        sql_connection: SqlConnection = args[0]
 
         if show_expected_result:
-            expected_result = _ensure_mongodb_compatible(*completed_kwargs["expected_result"])
+            expected_result = iter_mongodb_compatible(completed_kwargs["expected_result"], limit=result_sample_size)
         if show_actual_result:
-            actual_result = _ensure_mongodb_compatible(*assertion_result.query_result)
+            actual_result = iter_mongodb_compatible(assertion_result.query_result, limit=result_sample_size)
 
         match: bool = len(errors) + len(not_found_rows) == 0
+        if fingerprint_enabled and match:
+            sql_connection.fingerprint_store.save(fingerprint_key, fingerprint_record)
         error_detected: bool = (positivity == tt.POSITIVE.value and (not match or not acceptable_performance)) or (
                 positivity == tt.NEGATIVE.value and match)
         alias: str = completed_kwargs["result_informations"].alias
@@ -86,6 +129,127 @@ def assertion(assertion_fun):
     return assertion_method
 
 
+def _fingerprint_assertion_inputs(sql_connection: "SqlConnection", kwargs: dict, stored_record: dict | None,
+                                  assertion_arguments: dict) -> dict:
+    """
+    Fingerprint the actual and the expected result of an assertion.
+
+    If there is a golden fingerprint of the same assertion arguments, the results are fingerprinted first.
+    On a match the comparison is skipped, the consumed queries are executed again only on a mismatch.
+    Without a usable golden fingerprint the results are fingerprinted while the comparison fetches them,
+    so no query is executed twice.
+
+    Return:
+        the fingerprint record. Its fingerprint_match key is true if the comparison can be skipped.
+    """
+    fingerprint_record: dict = dict(assertion_arguments)
+    expected_result = kwargs.get("expected_result", [])
+    if not isinstance(expected_result, QueryResult):
+        fingerprint_record["expected_fingerprint"] = fingerprint_rows(expected_result)
+
+    golden_record_usable: bool = stored_record is not None and all(
+        stored_record.get(key) == value for key, value in fingerprint_record.items())
+    if not golden_record_usable:
+        _fingerprint_while_fetching(kwargs)
+        return fingerprint_record
+
+    result_informations: QueryResult = kwargs["result_informations"]
+    fingerprint_record["fingerprint"] = sql_connection.fingerprint_query_result(result_informations)
+    if fingerprint_record["fingerprint"] != stored_record.get("fingerprint"):
+        kwargs["result_informations"] = sql_connection.rerun_query(result_informations)
+        if isinstance(expected_result, QueryResult):
+            _fingerprint_while_fetching(kwargs, fingerprinted_keys=("expected_result",))
+        return fingerprint_record
+
+    if isinstance(expected_result, QueryResult):
+        fingerprint_record["expected_fingerprint"] = sql_connection.fingerprint_query_result(expected_result)
+        if fingerprint_record["expected_fingerprint"] != stored_record.get("expected_fingerprint"):
+            kwargs["result_informations"] = sql_connection.rerun_query(result_informations)
+            kwargs["expected_result"] = sql_connection.rerun_query(expected_result)
+            return fingerprint_record
+    fingerprint_record["fingerprint_match"] = True
+    return fingerprint_record
+
+
+def _fingerprint_while_fetching(kwargs: dict, fingerprinted_keys=("result_informations", "expected_result")) -> None:
+    for key in fingerprinted_keys:
+        if isinstance(kwargs.get(key), QueryResult):
+            kwargs[key] = replace(kwargs[key], result=_FingerprintingResult(kwargs[key].result))
+
+
+def _complete_fingerprint_record(fingerprint_record: dict, kwargs: dict) -> dict:
+    """
+    Add the fingerprints built during the comparison to the fingerprint record.
+    """
+    fingerprint_record = dict(fingerprint_record)
+    fingerprint_record.pop("fingerprint_match", None)
+    for key, record_key in (("result_informations", "fingerprint"), ("expected_result", "expected_fingerprint")):
+        argument = kwargs.get(key)
+        if isinstance(argument, QueryResult) and isinstance(argument.result, _FingerprintingResult):
+            fingerprint_record[record_key] = argument.result.hexdigest()
+    return fingerprint_record
+
+
+def _fingerprinted_arguments(assertion_fun, args: tuple, kwargs: dict) -> dict:
+    """
+    Return the assertion arguments which change the outcome of the comparison, besides the compared rows.
+    """
+    arguments: dict = inspect.signature(assertion_fun).bind_partial(*args, **kwargs).arguments
+    fingerprinted_arguments: dict = {}
+    if "column_name" in arguments:
+        fingerprinted_arguments["column_name"] = arguments["column_name"]
+    if "unique_assertion" in arguments:
+        fingerprinted_arguments["unique_assertion"] = _callable_fingerprint(arguments["unique_assertion"])
+    return fingerprinted_arguments
+
+
+def _callable_fingerprint(function) -> str:
+    """
+    Return the qualified name and the source code hash of a function, so a changed function invalidates
+    the golden fingerprint.
+    """
+    name: str = f"{getattr(function, '__module__', '')}.{getattr(function, '__qualname__', repr(function))}"
+    try:
+        source: str = inspect.getsource(function)
+    except (OSError, TypeError):
+        return name
+    return f"{name}:{hashlib.blake2b(source.encode(), digest_size=8).hexdigest()}"
+
+
+class _FingerprintingResult:
+    """
+    Proxy of a CursorResult, which fingerprints the rows while the assertion fetches them.
+    """
+
+    def __init__(self, result: CursorResult):
+        self._result: CursorResult = result
+        self._fingerprint = ResultFingerprint()
+
+    def mappings(self) -> "_FingerprintingResult":
+        return self
+
+    def fetchmany(self, size: int = None) -> list:
+        rows: list = self._result.mappings().fetchmany(size)
+        self._fingerprint.update(rows)
+        return rows
+
+    def fetchall(self) -> list:
+        rows: list = self._result.mappings().fetchall()
+        self._fingerprint.update(rows)
+        return rows
+
+    def hexdigest(self, fetch_size: int = 1000) -> str:
+        """
+        Fingerprint the rows the assertion didn't fetch, and return the fingerprint of the full result.
+        """
+        while len(self.fetchmany(fetch_size)) != 0:
+            pass
+        return self._fingerprint.hexdigest()
+
+    def __getattr__(self, name: str):
+        return getattr(self._result, name)
+
+
 def _get_testresult_type(error_detected: bool, match: bool) -> str:
     """
     Return the type of the testresult. it can be succesful, slow or failed.
@@ -100,14 +264,97 @@ def _get_testresult_type(error_detected: bool, match: bool) -> str:
 
 class SqlConnection:
 
-    def __init__(self, username, password, dbname, host, dialect_driver, port):
-        self.engine = sqlalchemy.create_engine(f'{dialect_driver}://{username}:{password}@{host}:{port}/{dbname}')
+    def __init__(self, username, password, dbname, host, dialect_driver, port, **engine_options):
+        """
+        Arguments:
+            engine_options: optional keyword arguments of sqlalchemy.create_engine,
+                for example pool_size and max_overflow for parallel workers.
+        """
+        self.engine = sqlalchemy.create_engine(f'{dialect_driver}://{username}:{password}@{host}:{port}/{dbname}',
+                                               **engine_options)
         self.cursor = self.engine.connect()
+        self._isolation = threading.local()
+        self.fingerprint_store: FingerprintStore = None
+        self._diff_columns: dict[str, list[str]] = {}
 
-    def connect(self, username, password, dbname, host, dialect_driver, port):
-        self.engine = sqlalchemy.create_engine(f'{dialect_driver}://{username}:{password}@{host}:{port}/{dbname}')
+    def connect(self, username, password, dbname, host, dialect_driver, port, **engine_options):
+        self.engine = sqlalchemy.create_engine(f'{dialect_driver}://{username}:{password}@{host}:{port}/{dbname}',
+                                               **engine_options)
         self.cursor = self.engine.connect()
 
+    def get_active_cursor(self):
+        """
+        Return the connection that the queries of the current thread have to use.
+        Inside an isolated_case block it is the case's own pooled connection, otherwise the shared cursor.
+        """
+        case_connection = getattr(self._isolation, "connection", None)
+        if case_connection is not None:
+            return case_connection
+        return self.cursor
+
+    def set_fingerprint_store(self, path: str) -> None:
+        """
+        Persist the golden fingerprints of the query results in the given json file.
+        Assertions called with use_fingerprint=True are evaluated as successful without row-level comparison,
+        if the fingerprint of their results is the same as the stored golden fingerprint.
+        """
+        self.fingerprint_store = FingerprintStore(path)
+
+    def fingerprint_query_result(self, result_informations: QueryResult, fetch_size: int = 1000) -> str:
+        """
+        Return the order-independent fingerprint of a query result. It consumes the result.
+
+        Arguments:
+            result_informations: an object which contains the result datas.
+            fetch_size: it set the pagesize of the fetching. default: 1000/page
+        """
+        fingerprint = ResultFingerprint()
+        partial_result: list = result_informations.result.mappings().fetchmany(fetch_size)
+        while len(partial_result) != 0:
+            fingerprint.update(partial_result)
+            partial_result = result_informations.result.mappings().fetchmany(fetch_size)
+        return fingerprint.hexdigest()
+
+    def rerun_query(self, result_informations: QueryResult) -> QueryResult:
+        """
+        Execute the query of a QueryResult again and return the new QueryResult.
+        """
+        return self.sql_query_by_text(text_query=result_informations.query, alias=result_informations.alias)
+
+    @contextmanager
+    def isolated_case(self):
+        """
+        Run a testcase in its own transaction and roll back every change on exit.
+        The case gets its own connection from the engine's pool, so parallel workers (threads)
+        sharing this SqlConnection never see each other's data. A nested isolated_case block
+        opens a savepoint on the same connection and rolls back only to that savepoint.
+
+        Example:
+            with sql_connection.isolated_case():
+                sql_connection.sql_query_by_text(text_query="INSERT ...", alias="setup")
+                sql_connection.identical_match_assertion(result_informations=..., expected_result=[...])
+        """
+        case_connection = getattr(self._isolation, "connection", None)
+        if case_connection is not None:
+            savepoint = case_connection.begin_nested()
+            try:
+                yield case_connection
+            finally:
+                if savepoint.is_active:
+                    savepoint.rollback()
+            return
+
+        case_connection = self.engine.connect()
+        transaction = case_connection.begin()
+        self._isolation.connection = case_connection
+        try:
+            yield case_connection
+        finally:
+            self._isolation.connection = None
+            if transaction.is_active:
+                transaction.rollback()
+            case_connection.close()
+
     @execute_query
     def sql_query_by_text(self, text_query: str, alias: str) -> QueryResult:
         """
@@ -141,6 +388,55 @@ class SqlConnection:
         query: object = select(table_params).where(select_param.in_(tuple(params)))
         return query
 
+    @execute_query
+    def sql_diff_by_text(self, actual_query: str, expected_query: str, column_name: str, alias: str) -> QueryResult:
+        """
+        Compare two queries inside the database. Both queries have to run on the server of this connection.
+        The result contains only the expected rows which are missing from the actual result or have different values.
+        The columns get positional aliases (e_0, a_0, ...), so long column names don't exceed the identifier
+        length limit of the database. Evaluate it with the database_side_comparator assertion of this connection,
+        which maps the aliases back to the column names.
+
+        Arguments:
+            actual_query: the query of the actual result in string format.
+            expected_query: the query of the expected result in string format.
+            column_name: the column's name that will be used as an id to pair the rows of the two queries.
+            alias: use this keyword to add this query a name/id
+
+        Return:
+            QueryResult object
+        """
+        columns: list[str] = self.get_query_columns(expected_query)
+        quote = self.engine.dialect.identifier_preparer.quote
+        selected_columns: list[str] = [f"expected_rows.{quote(column)} AS {_EXPECTED_PREFIX}{position}"
+                                       for position, column in enumerate(columns)]
+        selected_columns.extend(f"actual_rows.{quote(column)} AS {_ACTUAL_PREFIX}{position}"
+                                for position, column in enumerate(columns))
+        key_column: str = quote(column_name)
+        missing_row: str = f"actual_rows.{key_column} IS NULL"
+        different_columns: list[str] = [
+            f"(expected_rows.{quote(column)} <> actual_rows.{quote(column)}"
+            f" OR (expected_rows.{quote(column)} IS NULL AND actual_rows.{quote(column)} IS NOT NULL)"
+            f" OR (expected_rows.{quote(column)} IS NOT NULL AND actual_rows.{quote(column)} IS NULL))"
+            for column in columns if column != column_name]
+        query: str = (f"WITH expected_rows AS ({expected_query}), actual_rows AS ({actual_query}) "
+                      f"SELECT {', '.join(selected_columns)}, "
+                      f"CASE WHEN {missing_row} THEN 1 ELSE 0 END AS {quote(_NOT_FOUND_LABEL)} "
+                      f"FROM expected_rows LEFT JOIN actual_rows "
+                      f"ON expected_rows.{key_column} = actual_rows.{key_column} "
+                      f"WHERE {' OR '.join([missing_row] + different_columns)}")
+        self._diff_columns[query] = columns
+        return text(query)
+
+    def get_query_columns(self, text_query: str) -> list[str]:
+        """
+        Return the column names of a query without fetching any row.
+        """
+        probe = self.get_active_cursor().execute(text(f"SELECT * FROM ({text_query}) AS column_probe WHERE 1 = 0"))
+        columns: list[str] = list(probe.keys())
+        probe.close()
+        return columns
+
     @assertion
     def identical_match_assertion(self, result_informations: QueryResult,
                                   expected_result: list[dict]) -> QueryAssertionResult:
@@ -152,6 +448,12 @@ class SqlConnection:
                 Default value: False
             show_actual_result: If true, the error-logpost will contains the full result of the query.
                 Default value: True
+            result_sample_size: If set, the error-logpost contains only this many rows of the result,
+                the row count and the content hash of the full result. Default value: None
+            sampling_method: "first" keeps the first rows, "reservoir" keeps a uniform random sample.
+                Default value: "first"
+            use_fingerprint: If true and the connection has a fingerprint store, the assertion is successful
+                without row-level comparison when the result matches the stored golden fingerprint. Default value: False
             performance_limit_in_seconds: Add a limit to query-response.
                 If it cost more time than that, evaluated as failed query. default value: 1 second
             positivity: it determinate how to evaulate the result.
@@ -174,7 +476,7 @@ class SqlConnection:
 
     @assertion
     def subset_match_assertion(self, result_informations: QueryResult, expected_result: list[dict],
-                               fetch_size: int = 1000) -> QueryAssertionResult:
+                               fetch_size: int = 1000, result_sampler: "ResultSampler" = None) -> QueryAssertionResult:
 
         """
         Check weather the expected result is the subset of the actual result.
@@ -184,6 +486,12 @@ class SqlConnection:
                 Default value: False
             show_actual_result: If true, the error-logpost will contains the full result of the query.
                 Default value: True
+            result_sample_size: If set, the error-logpost contains only this many rows of the result,
+                the row count and the content hash of the full result. Default value: None
+            sampling_method: "first" keeps the first rows, "reservoir" keeps a uniform random sample.
+                Default value: "first"
+            use_fingerprint: If true and the connection has a fingerprint store, the assertion is successful
+                without row-level comparison when the result matches the stored golden fingerprint. Default value: False
             performance_limit_in_seconds: Add a limit to query-response.
                 If it cost more time than that, evaluated as failed query. default value: 1 second
             positivity: it determinate how to evaulate the result.
@@ -202,9 +510,14 @@ class SqlConnection:
         while there_is_row_left_to_check:
             partial_result_set: set = set(
                 {tuple(result_row.items()) for result_row in query_result.mappings().fetchmany(fetch_size)})
-            result_copy.update(partial_result_set)
+            if result_sampler is None:
+                result_copy.update(partial_result_set)
+            else:
+                result_sampler.update(partial_result_set)
             unmatched_rows.difference_update(partial_result_set)
             there_is_row_left_to_check = len(partial_result_set) != 0
+        if result_sampler is not None:
+            return result_sampler.to_assertion_result(errors=unmatched_rows, not_found_rows=[])
         return QueryAssertionResult(errors=unmatched_rows, not_found_rows=[], query_result=result_copy)
 
     @assertion
@@ -218,6 +531,12 @@ class SqlConnection:
                     Default value: False
                 show_actual_result: If true, the error-logpost will contains the full result of the query.
                     Default value: True
+                result_sample_size: If set, the error-logpost contains only this many rows of the result,
+                    the row count and the content hash of the full result. Default value: None
+                sampling_method: "first" keeps the first rows, "reservoir" keeps a uniform random sample.
+                    Default value: "first"
+                use_fingerprint: If true and the connection has a fingerprint store, the assertion is successful
+                    without row-level comparison when the result matches the stored golden fingerprint. Default value: False
                 performance_limit_in_seconds: Add a limit to query-response.
                     If it cost more time than that, evaluated as failed query. default value: 1 second
                 positivity: it determinate how to evaulate the result.
@@ -240,8 +559,8 @@ class SqlConnection:
 
     @assertion
     def deep_subset_match_assertion(self, column_name: str, result_informations: QueryResult,
-                                    expected_result: list[dict],
-                                    fetch_size: int = 1000) -> QueryAssertionResult:
+                                    expected_result: list[dict], fetch_size: int = 1000,
+                                    result_sampler: "ResultSampler" = None) -> QueryAssertionResult:
         """
             Check weather the expected result is the subset of the actual result.
             If the expected row doesn't match with the actual result's row,
@@ -252,6 +571,12 @@ class SqlConnection:
                     Default value: False
                 show_actual_result: If true, the error-logpost will contains the full result of the query.
                     Default value: True
+                result_sample_size: If set, the error-logpost contains only this many rows of the result,
+                    the row count and the content hash of the full result. Default value: None
+                sampling_method: "first" keeps the first rows, "reservoir" keeps a uniform random sample.
+                    Default value: "first"
+                use_fingerprint: If true and the connection has a fingerprint store, the assertion is successful
+                    without row-level comparison when the result matches the stored golden fingerprint. Default value: False
                 performance_limit_in_seconds: Add a limit to query-response.
                     If it cost more time than that, evaluated as failed query. default value: 1 second
                 positivity: it determinate how to evaulate the result.
@@ -273,6 +598,8 @@ class SqlConnection:
         not_found_rows: list[dict] = []
         partial_result_set: set = set(query_result.mappings().fetchmany(fetch_size))
         while there_is_row_left_to_check:
+            if result_sampler is not None:
+                result_sampler.update(partial_result_set)
 
             for expected_row in expected_result:
                 actual_row = find_row_by_id(collumn_name=column_name, expexted_row=expected_row,
@@ -280,19 +607,22 @@ class SqlConnection:
                 compare_rows(expected_row=expected_row, actual_row=actual_row, error_container=errors,
                              column_name=column_name, skipp_empty_row=True)
                 if actual_row is not None:
-                    result_copy.update(set(partial_result_set))
+                    if result_sampler is None:
+                        result_copy.update(set(partial_result_set))
                     partial_result_set.remove(actual_row)
                 else:
                     not_found_rows.append(expected_row)
 
             partial_result_set = set(query_result.mappings().fetchmany(fetch_size))
             there_is_row_left_to_check = len(partial_result_set) != 0
+        if result_sampler is not None:
+            return result_sampler.to_assertion_result(errors=errors, not_found_rows=not_found_rows)
         return QueryAssertionResult(errors=errors, not_found_rows=not_found_rows, query_result=result_copy)
 
     @assertion
     def query_result_comparator(self, column_name: str, result_informations: QueryResult,
-                                expected_result: QueryResult,
-                                fetch_size: int = 1000) -> QueryAssertionResult:
+                                expected_result: QueryResult, fetch_size: int = 1000,
+                                result_sampler: "ResultSampler" = None) -> QueryAssertionResult:
         """
             Check weather the expected result is the subset of the actual result.
             If the expected row doesn't match with the actual result's row,
@@ -305,6 +635,12 @@ class SqlConnection:
                     Default value: True \n
                 show_expected_result: If true, the error-logpost will contains the expected result of the query.
                     Default value: True
+                result_sample_size: If set, the error-logpost contains only this many rows of the result,
+                    the row count and the content hash of the full result. Default value: None
+                sampling_method: "first" keeps the first rows, "reservoir" keeps a uniform random sample.
+                    Default value: "first"
+                use_fingerprint: If true and the connection has a fingerprint store, the assertion is successful
+                    without row-level comparison when the result matches the stored golden fingerprint. Default value: False
                 performance_limit_in_seconds: Add a limit to query-response.
                     If it cost more time than that, evaluated as failed query. default value: 1 second
                 positivity: it determinate how to evaulate the result.
@@ -329,9 +665,12 @@ class SqlConnection:
         partial_result_set: set = set(actual_result_rows.mappings().fetchmany(fetch_size))
         expected_result_set: set = set(expected_result_rows.mappings().fetchmany(fetch_size))
         not_found_rows: set = set()
+        if result_sampler is not None:
+            result_sampler.update(partial_result_set)
         while there_is_row_left_to_check:
 
-            result_copy.update(partial_result_set)
+            if result_sampler is None:
+                result_copy.update(partial_result_set)
             sim_dif: set = expected_result_set.symmetric_difference(partial_result_set)
             expected_result_set.intersection_update(sim_dif)
             partial_result_set.intersection_update(sim_dif)
@@ -355,12 +694,214 @@ class SqlConnection:
                     not_found_rows.add(expected_row)
 
             expected_result_set: set = set(expected_result_rows.mappings().fetchmany(fetch_size))
-            partial_result_set = set(actual_result_rows.mappings().fetchmany(fetch_size)).union(partial_result_set)
+            fetched_result_set: set = set(actual_result_rows.mappings().fetchmany(fetch_size))
+            if result_sampler is not None:
+                result_sampler.update(fetched_result_set)
+            partial_result_set = fetched_result_set.union(partial_result_set)
             there_is_row_left_to_check = (len(expected_result_set) + len(not_found_rows) != 0) and (
                     len(partial_result_set) and len(expected_result_set) != 0)
 
+        if result_sampler is not None:
+            return result_sampler.to_assertion_result(errors=errors, not_found_rows=list(not_found_rows))
         return QueryAssertionResult(errors=errors, not_found_rows=list(not_found_rows), query_result=result_copy)
 
+    @assertion
+    def database_side_comparator(self, column_name: str, result_informations: QueryResult,
+                                 expected_result: list[dict] = [], fetch_size: int = 1000,
+                                 result_sampler: "ResultSampler" = None) -> QueryAssertionResult:
+        """
+            Evaluate the result of a sql_diff_by_text query. The comparison already happened in the database,
+            so only the mismatching rows are fetched. The result has the same shape as the query_result_comparator's.
+
+            Special keyword arguments:
+                critical_step: If true and this step failed on the assertion, the following casesteps will be skipped.
+                    Default value: False
+                show_actual_result: If true, the error-logpost will contains the mismatching rows of the actual result.
+                    Default value: True
+                result_sample_size: If set, the error-logpost contains only this many mismatching rows,
+                    the row count and the content hash of every mismatching row. Default value: None
+                sampling_method: "first" keeps the first rows, "reservoir" keeps a uniform random sample.
+                    Default value: "first"
+                use_fingerprint: If true and the connection has a fingerprint store, the assertion is successful
+                    without row-level comparison when the diff result matches the stored golden fingerprint.
+                    Default value: False
+                performance_limit_in_seconds: Add a limit to query-response.
+                    If it cost more time than that, evaluated as failed query. default value: 1 second
+                positivity: it determinate how to evaulate the result.
+                    it can be "positive" or "negative". default value: "positive"
+                properties: Optional parameter. A dictionary, that contains other aspect of the query.
+
+            Arguments:
+                 column_name: the column's name that was used as an id in the sql_diff_by_text query.
+                 fetch_size: it set the pagesize of the resultcheck method. default: 1000/page
+                 result_informations: the QueryResult of a sql_diff_by_text query.
+                 expected_result: optional. The expected rows, only used in the error-logpost.
+
+            Example:
+                diff = sql_connection.sql_diff_by_text(actual_query="SELECT ...", expected_query="SELECT ...",
+                                                       column_name="id", alias="orders")
+                sql_connection.database_side_comparator(column_name="id", result_informations=diff)
+        """
+        result_copy: list[dict] = []
+        errors: list[dict] = []
+        not_found_rows: list[dict] = []
+        columns: list[str] | None = self._diff_columns.get(result_informations.query)
+        partial_result: list = result_informations.result.mappings().fetchmany(fetch_size)
+        while len(partial_result) != 0:
+            for diff_row in partial_result:
+                expected_row, actual_row = _split_diff_row(diff_row, columns)
+                if diff_row[_NOT_FOUND_LABEL]:
+                    not_found_rows.append(expected_row)
+                    continue
+                compare_rows(expected_row=expected_row, actual_row=actual_row, error_container=errors,
+                             column_name=column_name, skipp_empty_row=True)
+                if result_sampler is None:
+                    result_copy.append(actual_row)
+                else:
+                    result_sampler.add(actual_row)
+            partial_result = result_informations.result.mappings().fetchmany(fetch_size)
+
+        if result_sampler is not None:
+            return result_sampler.to_assertion_result(errors=errors, not_found_rows=not_found_rows)
+        return QueryAssertionResult(errors=errors, not_found_rows=not_found_rows, query_result=result_copy)
+
+
+_EXPECTED_PREFIX: str = "e_"
+_ACTUAL_PREFIX: str = "a_"
+_NOT_FOUND_LABEL: str = "not_found__"
+
+
+def _split_diff_row(diff_row: dict, columns: list[str] = None) -> tuple[dict, dict]:
+    """
+    Split a row of a sql_diff_by_text query to the expected and the actual row.
+
+    Arguments:
+        diff_row: a row of the diff result, with the positional e_<n> and a_<n> aliases.
+        columns: the column names in the order of the positions. If None, the positional aliases are kept.
+    """
+    expected_row: dict = {}
+    actual_row: dict = {}
+    for key, value in diff_row.items():
+        for prefix, row in ((_EXPECTED_PREFIX, expected_row), (_ACTUAL_PREFIX, actual_row)):
+            if key.startswith(prefix) and key[len(prefix):].isdigit():
+                position: int = int(key[len(prefix):])
+                row[columns[position] if columns is not None else key] = value
+    return expected_row, actual_row
+
+
+class ResultSampler:
+    """
+    Keep a bounded sample of the rows of a query result,
+    while counting every row and hashing the content of the full result.
+    """
+
+    def __init__(self, sample_size: int, sampling_method: str = SamplingMethods.FIRST.value, seed: int = None):
+        """
+        Arguments:
+            sample_size: the maximum number of kept rows.
+            sampling_method: "first" keeps the first rows, "reservoir" keeps a uniform random sample.
+            seed: optional seed of the reservoir sampling.
+        """
+        if sampling_method not in {method.value for method in SamplingMethods}:
+            raise ValueError(f"Unknown sampling method: '{sampling_method}'")
+        self.sample_size: int = sample_size
+        self.sampling_method: str = sampling_method
+        self.rows: list = []
+        self.row_count: int = 0
+        self._content_hash: int = 0
+        self._random = random.Random(seed)
+
+    def add(self, row) -> None:
+        self.row_count += 1
+        self._content_hash = (self._content_hash + _row_digest(row)) % _HASH_MODULUS
+        if len(self.rows) < self.sample_size:
+            self.rows.append(row)
+        elif self.sampling_method == SamplingMethods.RESERVOIR.value:
+            replaced_index: int = self._random.randrange(self.row_count)
+            if replaced_index < self.sample_size:
+                self.rows[replaced_index] = row
+
+    def update(self, rows) -> None:
+        for row in rows:
+            self.add(row)
+
+    def summary(self) -> ResultSample:
+        return ResultSample(rows=self.rows, row_count=self.row_count, content_hash=f"{self._content_hash:016x}",
+                            sampling_method=self.sampling_method)
+
+    def to_assertion_result(self, errors, not_found_rows: list) -> QueryAssertionResult:
+        result_sample: ResultSample = self.summary()
+        return QueryAssertionResult(errors=errors, not_found_rows=not_found_rows, query_result=result_sample.rows,
+                                    result_sample=result_sample)
+
+
+_HASH_MODULUS: int = 2 ** 64
+
+
+class ResultFingerprint:
+    """
+    Streaming, order-independent fingerprint of a query result: the row count, the sum and the xor of the row hashes.
+    """
+
+    def __init__(self):
+        self.row_count: int = 0
+        self.row_sum: int = 0
+        self.row_xor: int = 0
+
+    def update(self, rows) -> None:
+        for row in rows:
+            row_digest: int = _row_digest(row)
+            self.row_count += 1
+            self.row_sum = (self.row_sum + row_digest) % _HASH_MODULUS
+            self.row_xor ^= row_digest
+
+    def hexdigest(self) -> str:
+        return f"{self.row_count}-{self.row_sum:016x}-{self.row_xor:016x}"
+
+
+def fingerprint_rows(rows) -> str:
+    """
+    Return the order-independent fingerprint of any iterable of rows.
+    """
+    fingerprint = ResultFingerprint()
+    fingerprint.update(rows)
+    return fingerprint.hexdigest()
+
+
+class FingerprintStore:
+    """
+    Json file based storage of the golden fingerprints, keyed by query alias and assertion type.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._fingerprints: dict = {}
+        if self.path.exists():
+            self._fingerprints = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def get(self, key: str) -> dict | None:
+        return self._fingerprints.get(key)
+
+    def save(self, key: str, fingerprint_record: dict) -> None:
+        with self._lock:
+            if self._fingerprints.get(key) == fingerprint_record:
+                return
+            self._fingerprints[key] = fingerprint_record
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary_path = self.path.with_suffix(f"{self.path.suffix}.tmp")
+            temporary_path.write_text(json.dumps(self._fingerprints, indent=2, sort_keys=True), encoding="utf-8")
+            os.replace(temporary_path, self.path)
+
+
+def _row_digest(row) -> int:
+    """
+    Return a stable 64 bit hash of a row. The order of the columns doesn't matter.
+    """
+    items = row.items() if isinstance(row, Mapping) else row
+    normalised_row: str = repr(sorted((str(key), repr(value)) for key, value in items))
+    return int.from_bytes(hashlib.blake2b(normalised_row.encode(), digest_size=8).digest(), "big")
+
 
 def performance_check(sql_result: QueryResult, timelimit_in_seconds: float) -> bool:
     performance_check_result = sql_result.required_time < timelimit_in_seconds
@@ -422,30 +963,131 @@ def _add_error_to_container(errors_in_row: set[tuple], key_column: str, error_co
          "actual_datas": actual_data})
 
 
-def _ensure_mongodb_compatible(*args):
-    formatted_list: list = []
-    for element in args:
-        formatted_element: dict = _format_list_element(element)
-        formatted_list.append(formatted_element)
-    return formatted_list
+def _ensure_mongodb_compatible(*args, limit: int = None) -> list[dict]:
+    """
+    Convert rows to mongoDB compatible documents.
 
+    Arguments:
+        limit: the maximum number of converted rows. If None, every row is converted.
+    """
+    return list(iter_mongodb_compatible(args, limit=limit))
 
-def _decimals_in_dict_to_int(dictionary: dict):
-    for key in dictionary.keys():
-        if isinstance(dictionary[key], Decimal):
-            dictionary[key] = int(dictionary[key])
 
+def iter_mongodb_compatible(rows, limit: int = None):
+    """
+    Lazily convert rows (dicts, row mappings or tuples of key-value pairs) to mongoDB compatible documents.
+    Only the currently yielded document exists in memory, the source rows are not copied or modified.
 
-def _format_list_element(element):
-    if isinstance(element, dict):
-        for key, value in element.items():
-            if isinstance(element[key], tuple):
-                element[key] = _format_list_element(element[key])
+    Arguments:
+        rows: any iterable of rows.
+        limit: the maximum number of yielded documents. If None, every row is converted.
+    """
+    for row_number, row in enumerate(rows):
+        if limit is not None and row_number >= limit:
+            return
+        yield _format_list_element(row)
 
-    new_dict = dict(element)
-    _decimals_in_dict_to_int(new_dict)
 
-    return new_dict
+def write_mongodb_compatible(rows, sink, sink_format: str = "json", limit: int = None) -> int:
+    """
+    Stream the converted rows directly into a file-like sink without materialising them.
+
+    Arguments:
+        rows: any iterable of rows.
+        sink: a writable file-like object. Text mode for json, binary mode for bson.
+        sink_format: "json" writes one extended-json document per line, "bson" writes concatenated bson documents.
+        limit: the maximum number of written documents.
+
+    Return:
+        the number of written documents.
+    """
+    match sink_format:
+        case "json":
+            def write(document: dict):
+                sink.write(json_util.dumps(document))
+                sink.write("\n")
+        case "bson":
+            def write(document: dict):
+                sink.write(bson.encode(document))
+        case _:
+            raise ValueError(f"Unknown sink format: '{sink_format}'")
+
+    written_documents: int = 0
+    for document in iter_mongodb_compatible(rows, limit=limit):
+        write(document)
+        written_documents += 1
+    return written_documents
+
+
+def _convert_date(value: date) -> datetime:
+    return datetime(value.year, value.month, value.day)
+
+
+def _convert_decimal(value: Decimal) -> Decimal128 | str:
+    """
+    Convert a decimal to Decimal128. Values with more than 34 significant digits are rounded to 34 digits,
+    the values out of the Decimal128 range are kept as strings.
+    """
+    try:
+        return Decimal128(value)
+    except Inexact:
+        pass
+    rounding_context = create_decimal128_context()
+    rounding_context.traps[Inexact] = False
+    try:
+        rounded_value: Decimal = rounding_context.create_decimal(value)
+    except DecimalException:
+        return str(value)
+    if rounded_value.is_infinite():
+        return str(value)
+    return Decimal128(rounded_value)
+
+
+def _convert_pairs(value: tuple):
+    """
+    Convert a tuple of key-value pairs to a document and any other tuple to a list.
+    """
+    if len(value) != 0 and all(isinstance(element, tuple) and len(element) == 2 for element in value):
+        return _format_list_element(value)
+    return [_convert_value(element) for element in value]
+
+
+_MONGODB_CONVERTERS: dict = {
+    Decimal: _convert_decimal,
+    date: _convert_date,
+    time: time.isoformat,
+    timedelta: timedelta.total_seconds,
+    UUID: Binary.from_uuid,
+    bytes: Binary,
+    bytearray: Binary,
+    memoryview: lambda value: Binary(value.tobytes()),
+    set: lambda value: [_convert_value(element) for element in value],
+    frozenset: lambda value: [_convert_value(element) for element in value],
+    list: lambda value: [_convert_value(element) for element in value],
+    tuple: _convert_pairs,
+    dict: lambda value: _format_list_element(value),
+}
+
+_BSON_NATIVE_TYPES: tuple = (str, int, float, bool, datetime, type(None))
+
+
+def _convert_value(value):
+    if isinstance(value, _BSON_NATIVE_TYPES):
+        return value
+    converter = _MONGODB_CONVERTERS.get(type(value))
+    if converter is None:
+        for convertible_type, registered_converter in _MONGODB_CONVERTERS.items():
+            if isinstance(value, convertible_type):
+                converter = registered_converter
+                break
+    if converter is None:
+        return str(value)
+    return converter(value)
+
+
+def _format_list_element(element) -> dict:
+    items = element.items() if isinstance(element, Mapping) else element
+    return {str(key): _convert_value(value) for key, value in items}
 
 
 def contains_query_result(args_kwargs: list):
@@ -0,0 +1,41 @@
+"""
+Az import-idő regressziós tesztje: a csak API-teszteket futtató folyamatok nem tölthetik be a nehéz függőségeket
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SOURCE_DIRECTORY: Path = Path(__file__).resolve().parents[1] / "src"
+HEAVY_MODULES: tuple[str, ...] = ("selenium", "sqlalchemy", "pymongo", "faker")
+
+
+def _import_in_fresh_interpreter(module_name: str, *interpreter_options: str) -> subprocess.CompletedProcess:
+    """
+    Import the module in a new interpreter and print the loaded heavy modules as json.
+    """
+    environment: dict = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SOURCE_DIRECTORY), environment.get("PYTHONPATH")]))
+    script: str = (f"import json, sys\nimport {module_name}\n"
+                   f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))")
+    return subprocess.run([sys.executable, *interpreter_options, "-c", script], capture_output=True, text=True,
+                          env=environment, check=True)
+
+
+@pytest.mark.parametrize("module_name", ["lighttest_basic", "lighttest_basic.http_requests"])
+def test_api_only_import_path_doesnt_load_heavy_modules(module_name: str):
+    if module_name != "lighttest_basic":
+        pytest.importorskip("lighttest_supplies")
+    loaded_heavy_modules: list[str] = json.loads(_import_in_fresh_interpreter(module_name).stdout)
+    assert loaded_heavy_modules == []
+
+
+def test_importtime_of_http_requests_has_no_heavy_modules():
+    pytest.importorskip("lighttest_supplies")
+    importtime_report: str = _import_in_fresh_interpreter("lighttest_basic.http_requests", "-X", "importtime").stderr
+    imported_modules: set[str] = {line.rsplit("|", 1)[-1].strip() for line in importtime_report.splitlines()
+                                  if line.startswith("import time:")}
+    assert imported_modules.isdisjoint(HEAVY_MODULES)